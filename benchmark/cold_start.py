@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+
+from qdrant.snapshot import wait_ready
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--client-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument("--collection-prefix", type=str, default="chefrag-cold-start")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--chunks-file", type=str, default="data/chunks.parquet")
+    parser.add_argument("--chunks-mmap", type=str, default="data/embeddings.mmap")
+    parser.add_argument("--manifest-file", type=str, required=True)
+    parser.add_argument("--server-snapshot-folder", type=str, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=1800)
+
+    return parser.parse_args()
+
+
+def run_script(script: str, args: list[str]) -> None:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(ROOT), env.get("PYTHONPATH")) if p
+    )
+    subprocess.run([sys.executable, str(ROOT / script), *args], env=env, check=True)
+
+
+def time_to_ready(
+    client: QdrantClient,
+    collection_name: str,
+    script: str,
+    args: list[str],
+    timeout: float,
+) -> tuple[float, int]:
+    client.delete_collection(collection_name)
+
+    start = time.perf_counter()
+    run_script(script, args)
+    wait_ready(client, collection_name, timeout)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, client.get_collection(collection_name).points_count
+
+
+def main() -> None:
+    args = parse_args()
+
+    client = QdrantClient(url=args.client_api_url, timeout=int(args.timeout))
+    reupload_collection = f"{args.collection_prefix}-reupload"
+    restore_collection = f"{args.collection_prefix}-restore"
+
+    reupload_args = [
+        "--client-api-url",
+        args.client_api_url,
+        "--collection-name",
+        reupload_collection,
+        "--embedding-dim",
+        str(args.embedding_dim),
+        "--chunks-file",
+        args.chunks_file,
+        "--chunks-mmap",
+        args.chunks_mmap,
+    ]
+    restore_args = [
+        "--action",
+        "restore",
+        "--client-api-url",
+        args.client_api_url,
+        "--collection-name",
+        restore_collection,
+        "--manifest-file",
+        args.manifest_file,
+        "--chunks-mmap",
+        args.chunks_mmap,
+        "--timeout",
+        str(args.timeout),
+    ]
+    if args.server_snapshot_folder is not None:
+        restore_args += ["--server-snapshot-folder", args.server_snapshot_folder]
+
+    for name, collection_name, script, script_args in (
+        ("re-upload", reupload_collection, "qdrant/upload.py", reupload_args),
+        ("restore", restore_collection, "qdrant/snapshot.py", restore_args),
+    ):
+        timings = []
+        for _ in range(args.repeats):
+            elapsed, points_count = time_to_ready(
+                client, collection_name, script, script_args, args.timeout
+            )
+            timings.append(elapsed)
+        print(
+            f"{name}: {points_count} points, time-to-ready "
+            f"min {min(timings):.1f}s, mean {sum(timings) / len(timings):.1f}s"
+        )
+        client.delete_collection(collection_name)
+
+
+if __name__ == "__main__":
+    main()
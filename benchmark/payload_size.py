@@ -0,0 +1,112 @@
+import json
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+from qdrant.upload import chunk_payload
+from utils.delta import chunk_ids
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--chunks-file", type=str, default="data/chunks.parquet")
+    parser.add_argument("--chunks-mmap", type=str, default="data/embeddings.mmap")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--doc-store", type=str, default="data/recipes.sqlite")
+    parser.add_argument("--qdrant-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument("--collection-names", type=str, nargs="*", default=[])
+    parser.add_argument("--storage-folder", type=str, default="qdrant_storage")
+    parser.add_argument("--n-queries", type=int, default=100)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+
+    return parser.parse_args()
+
+
+def payload_bytes(chunk_df: pd.DataFrame, slim: bool) -> int:
+    recipe_id_column = "recipe_id" if "recipe_id" in chunk_df.columns else "id"
+    return sum(
+        len(
+            json.dumps(
+                chunk_payload(row, recipe_id_column, {}, slim), ensure_ascii=False
+            ).encode()
+        )
+        for _, row in chunk_df.iterrows()
+    )
+
+
+def folder_size(folder: Path) -> int:
+    if not folder.is_dir():
+        return 0
+    return sum(f.stat().st_size for f in folder.rglob("*") if f.is_file())
+
+
+def response_sizes(
+    api_url: str, collection_name: str, vectors: np.ndarray, topk: int
+) -> tuple[float, float]:
+    session = requests.Session()
+    sizes, latencies = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        response = session.post(
+            url=f"{api_url}/collections/{collection_name}/points/query",
+            json={"query": vector.tolist(), "limit": topk, "with_payload": True},
+            timeout=60,
+        )
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        sizes.append(len(response.content))
+    return float(np.mean(sizes)), float(np.mean(latencies))
+
+
+def main() -> None:
+    args = parse_args()
+
+    chunk_df = pd.read_parquet(args.chunks_file)
+    full_bytes = payload_bytes(chunk_df, slim=False)
+    slim_bytes = payload_bytes(chunk_df, slim=True)
+    doc_store = Path(args.doc_store)
+    doc_store_bytes = doc_store.stat().st_size if doc_store.is_file() else 0
+
+    print(f"points: {chunk_df.shape[0]}")
+    print(f"full payload: {full_bytes / 2**20:.1f} MiB")
+    print(
+        f"slim payload: {slim_bytes / 2**20:.1f} MiB "
+        f"+ doc store {doc_store_bytes / 2**20:.1f} MiB"
+    )
+
+    if not args.collection_names:
+        return
+
+    ids = chunk_ids(chunk_df)
+    chunk_mmap = np.memmap(
+        filename=args.chunks_mmap,
+        dtype=np.float32,
+        shape=(int(ids.max(initial=-1)) + 1, args.embedding_dim),
+        mode="r",
+    )
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(ids, size=min(args.n_queries, ids.shape[0]), replace=False)
+    vectors = np.asarray(chunk_mmap[np.sort(sample)])
+
+    for collection_name in args.collection_names:
+        storage_bytes = folder_size(
+            Path(args.storage_folder) / "collections" / collection_name
+        )
+        response_bytes, latency = response_sizes(
+            args.qdrant_api_url, collection_name, vectors, args.topk
+        )
+        print(
+            f"{collection_name}: storage {storage_bytes / 2**20:.1f} MiB, "
+            f"response {response_bytes / 1024:.1f} KiB, "
+            f"latency {latency * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
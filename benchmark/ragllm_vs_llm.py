@@ -1,38 +1,81 @@
+import json
 from argparse import ArgumentParser, Namespace
 from pathlib import Path, PurePath
-from typing import Iterable
 
 import numpy as np
 import pandas as pd
-import torch
 from tqdm.auto import tqdm
-from vllm import LLM
 
+from utils.embedders import DEFAULT_MODELS, Embedder, get_embedder
 
-def cosine_similarity(a: np.memmap, b: np.memmap) -> float:
-    a_norm = a / np.linalg.norm(a, ord=2)
-    b_norm = b / np.linalg.norm(b, ord=2)
 
-    per_sample_sim = np.sum(a_norm * b_norm, axis=1)
-    return per_sample_sim.mean()
+def row_norms(mmap: np.memmap, block_size: int = 4096) -> np.ndarray:
+    norms_filename = Path(f"{mmap.filename}.norms.npy")
+    if (
+        norms_filename.is_file()
+        and norms_filename.stat().st_mtime >= Path(mmap.filename).stat().st_mtime
+    ):
+        norms = np.load(norms_filename)
+        if norms.shape[0] == mmap.shape[0]:
+            return norms
 
+    norms = np.empty(mmap.shape[0], dtype=np.float32)
+    for block_start in range(0, mmap.shape[0], block_size):
+        block = np.asarray(mmap[block_start : block_start + block_size])
+        norms[block_start : block_start + block.shape[0]] = np.linalg.norm(
+            block, ord=2, axis=1
+        )
 
-class TextDataset(torch.utils.data.Dataset):
-    def __init__(self, texts: list[str]) -> None:
-        self.texts = texts
-
-    def __len__(self) -> int:
-        return len(self.texts)
-
-    def __getitem__(self, idx: int) -> str:
-        return self.texts[idx]
-
+    np.save(norms_filename, norms)
+    return norms
+
+
+def blocked_cosine_similarity(
+    mmaps: dict[str, np.memmap],
+    pairs: list[tuple[str, str]],
+    block_size: int = 4096,
+) -> dict[tuple[str, str], np.ndarray]:
+    norms = {
+        name: np.maximum(row_norms(m, block_size), 1e-12) for name, m in mmaps.items()
+    }
+    length = next(iter(mmaps.values())).shape[0]
+    sims = {pair: np.empty(length, dtype=np.float32) for pair in pairs}
+
+    for block_start in range(0, length, block_size):
+        block_end = min(block_start + block_size, length)
+        blocks = {
+            name: np.asarray(m[block_start:block_end]) for name, m in mmaps.items()
+        }
+
+        for a, b in pairs:
+            dots = np.einsum("ij,ij->i", blocks[a], blocks[b])
+            sims[(a, b)][block_start:block_end] = dots / (
+                norms[a][block_start:block_end] * norms[b][block_start:block_end]
+            )
+
+    return sims
+
+
+def bootstrap_ci(
+    values: np.ndarray,
+    n_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    chunk_size: int = 1000,
+) -> tuple[float, float, float]:
+    rng = np.random.default_rng(seed)
+    means = np.empty(n_resamples, dtype=np.float64)
+
+    for chunk_start in range(0, n_resamples, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, n_resamples)
+        idx = rng.integers(
+            0, values.shape[0], size=(chunk_end - chunk_start, values.shape[0])
+        )
+        means[chunk_start:chunk_end] = values[idx].mean(axis=1)
 
-def collate_fn(batch: Iterable) -> list[str]:
-    texts = []
-    for item in batch:
-        texts.append(item)
-    return texts
+    alpha = (1.0 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1.0 - alpha])
+    return float(values.mean()), float(low), float(high)
 
 
 def parse_args() -> Namespace:
@@ -48,45 +91,65 @@ def parse_args() -> Namespace:
         "--rag-llm-column", type=str, default="rag_llm_full_recipe_answer"
     )
     parser.add_argument("--mmap-length", type=int)
-    return parser.parse_args()
+    parser.add_argument("--embedding-dim", type=int, default=3584)
+    parser.add_argument(
+        "--embedder-backend",
+        type=str,
+        choices=list(DEFAULT_MODELS),
+        default="vllm",
+    )
+    parser.add_argument("--embedder-model", type=str, default=None)
+    parser.add_argument(
+        "--ollama-api-url", type=str, default="http://localhost:11434/api/embed"
+    )
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--stub-dim", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--n-resamples", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+
+    args = parser.parse_args()
+    if args.embedder_model is None:
+        args.embedder_model = DEFAULT_MODELS[args.embedder_backend]
+    return args
+
+
+def build_embedder(args: Namespace) -> Embedder:
+    if args.embedder_backend == "ollama":
+        return get_embedder("ollama", args.embedder_model, api_url=args.ollama_api_url)
+    if args.embedder_backend == "sentence-transformers":
+        return get_embedder(
+            "sentence-transformers", args.embedder_model, device=args.device
+        )
+    if args.embedder_backend == "stub":
+        return get_embedder("stub", args.embedder_model, dim=args.stub_dim)
+    return get_embedder("vllm", args.embedder_model)
 
 
 def _vectorize(
-    llm_model: LLM,
+    embedder: Embedder,
     texts: list[str],
     mmap_filename: PurePath,
     batch_size: int = 256,
-    workers: int = 16,
     flush_every: int = 100,
-) -> np.memmap:
-    dataset = TextDataset(texts=texts)
-    dataloader = torch.utils.data.DataLoader(
-        dataset=dataset,
-        batch_size=batch_size,
-        shuffle=False,
-        pin_memory=True,
-        num_workers=workers,
-        collate_fn=collate_fn,
-    )
-
+) -> None:
     mmap = np.memmap(
-        filename=mmap_filename, shape=(len(dataset), 3584), dtype=np.float32, mode="w+"
+        filename=mmap_filename,
+        shape=(len(texts), embedder.dim),
+        dtype=np.float32,
+        mode="w+",
     )
 
-    with torch.no_grad(), torch.amp.autocast("cuda"):
-        for batch_idx, batch in enumerate(tqdm(dataloader, total=len(dataloader))):
-            embs = llm_model.encode(batch, use_tqdm=False)
+    batch_starts = range(0, len(texts), batch_size)
+    for batch_idx, batch_start in enumerate(tqdm(batch_starts)):
+        batch_end = min(batch_start + batch_size, len(texts))
+        mmap[batch_start:batch_end] = embedder.encode(texts[batch_start:batch_end])
 
-            batch_start = batch_idx * batch_size
-            for emb_idx, emb in enumerate(embs):
-                mmap[batch_start + emb_idx, :] = np.array(
-                    emb.outputs.embedding, dtype=np.float32
-                )
+        if (batch_idx + 1) % flush_every == 0:
+            mmap.flush()
 
-            if (batch_idx + 1) % flush_every == 0:
-                mmap.flush()
-
-        mmap.flush()
+    mmap.flush()
 
 
 def vectorize_df(
@@ -95,26 +158,23 @@ def vectorize_df(
     llm_column: str,
     rag_llm_column: str,
     save_folder: PurePath,
+    embedder: Embedder,
+    batch_size: int,
 ) -> None:
-    llm = LLM(model="BAAI/bge-multilingual-gemma2")
-
-    _vectorize(
-        llm_model=llm,
-        texts=df[gt_column].to_list(),
-        mmap_filename=save_folder / "gt.mmap",
-    )
-
-    _vectorize(
-        llm_model=llm,
-        texts=df[llm_column].to_list(),
-        mmap_filename=save_folder / "llm.mmap",
-    )
+    for column, mmap_name in (
+        (gt_column, "gt.mmap"),
+        (llm_column, "llm.mmap"),
+        (rag_llm_column, "rag_llm.mmap"),
+    ):
+        _vectorize(
+            embedder=embedder,
+            texts=df[column].astype(str).to_list(),
+            mmap_filename=save_folder / mmap_name,
+            batch_size=batch_size,
+        )
 
-    _vectorize(
-        llm_model=llm,
-        texts=df[rag_llm_column].to_list(),
-        mmap_filename=save_folder / "rag_llm.mmap",
-    )
+    with open(save_folder / "meta.json", "w") as f:
+        json.dump({"length": df.shape[0], "dim": embedder.dim}, f, indent=4)
 
 
 def main() -> None:
@@ -131,36 +191,51 @@ def main() -> None:
             args.llm_column,
             args.rag_llm_column,
             save_folder,
+            build_embedder(args),
+            args.batch_size,
         )
 
-    shape = score_df.shape[0] if args.process_raw_df else args.mmap_length
-
-    gt_mmap = np.memmap(
-        filename=save_folder / "gt.mmap",
-        shape=(shape, 3584),
-        dtype=np.float32,
-        mode="r",
-    )
-
-    llm_mmap = np.memmap(
-        filename=save_folder / "llm.mmap",
-        shape=(shape, 3584),
-        dtype=np.float32,
-        mode="r",
-    )
+    meta_filename = save_folder / "meta.json"
+    if meta_filename.is_file():
+        with open(meta_filename) as f:
+            meta = json.load(f)
+        shape = (args.mmap_length or meta["length"], meta["dim"])
+    else:
+        shape = (args.mmap_length, args.embedding_dim)
+
+    mmaps = {
+        name: np.memmap(
+            filename=save_folder / f"{name}.mmap",
+            shape=shape,
+            dtype=np.float32,
+            mode="r",
+        )
+        for name in ("gt", "llm", "rag_llm")
+    }
 
-    rag_llm_mmap = np.memmap(
-        filename=save_folder / "rag_llm.mmap",
-        shape=(shape, 3584),
-        dtype=np.float32,
-        mode="r",
+    sims = blocked_cosine_similarity(
+        mmaps=mmaps,
+        pairs=[("gt", "llm"), ("gt", "rag_llm"), ("llm", "rag_llm")],
+        block_size=args.block_size,
     )
 
-    cos1 = cosine_similarity(gt_mmap, llm_mmap)
-    cos2 = cosine_similarity(gt_mmap, rag_llm_mmap)
-
-    print(f"Similarity for LLM answers = {cos1:.4f}")
-    print(f"Similarity for RAG-LLM answers = {cos2:.4f}")
+    scores = {
+        "Similarity for LLM answers": sims[("gt", "llm")],
+        "Similarity for RAG-LLM answers": sims[("gt", "rag_llm")],
+        "Similarity between LLM and RAG-LLM answers": sims[("llm", "rag_llm")],
+        "RAG-LLM gain over LLM": sims[("gt", "rag_llm")] - sims[("gt", "llm")],
+    }
+
+    for name, values in scores.items():
+        mean, low, high = bootstrap_ci(
+            values=values,
+            n_resamples=args.n_resamples,
+            confidence=args.confidence,
+        )
+        print(
+            f"{name} = {mean:.4f} "
+            f"({args.confidence:.0%} CI {low:.4f} .. {high:.4f})"
+        )
 
 
 if __name__ == "__main__":
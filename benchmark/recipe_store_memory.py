@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--raw-filename", type=str, default="data/recipes_texts.csv")
+    parser.add_argument(
+        "--stop-chars-filename", type=str, default="data/stop_chars.json"
+    )
+    parser.add_argument(
+        "--strategies",
+        type=str,
+        nargs="+",
+        default=["all_kinds", "recipe_and_ingredients", "full_recipe"],
+    )
+    parser.add_argument("--work-folder", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def run_measured(script: str, args: list[str]) -> tuple[float, float]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(ROOT), env.get("PYTHONPATH")) if p
+    )
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / script), *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} {' '.join(args)} failed")
+
+    peak = usage.ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024, elapsed
+
+
+def benchmark(args: Namespace, folder: Path) -> pd.DataFrame:
+    clean_csv = str(folder / "recipes_texts_clean.csv")
+    store = str(folder / "recipes_texts_clean.arrow")
+    common = ["--raw-filename", args.raw_filename]
+    stop_chars = ["--stop-chars-filename", args.stop_chars_filename]
+
+    steps = {
+        "pandas": [
+            ("clean_texts", [*common, *stop_chars, "--clean-filename", clean_csv]),
+            (
+                "create_chunks",
+                ["--raw-filename", clean_csv, "--chunks-folder", str(folder / "a")],
+            ),
+        ],
+        "store": [
+            ("clean_texts", [*common, *stop_chars, "--store-file", store]),
+            (
+                "create_chunks",
+                ["--store-file", store, "--chunks-folder", str(folder / "b")],
+            ),
+        ],
+    }
+
+    rows = []
+    for representation, representation_steps in steps.items():
+        for name, script_args in representation_steps:
+            if name == "create_chunks":
+                script_args = script_args + ["--strategies", *args.strategies]
+            peak_rss_mb, wall_s = run_measured(f"chunks/{name}.py", script_args)
+            rows.append(
+                {
+                    "representation": representation,
+                    "step": name,
+                    "peak_rss_mb": peak_rss_mb,
+                    "wall_s": wall_s,
+                }
+            )
+            print(rows[-1])
+
+    return pd.DataFrame(rows)
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.work_folder is not None:
+        report_df = benchmark(args, Path(args.work_folder))
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            report_df = benchmark(args, Path(folder))
+
+    print(
+        report_df.pivot(
+            index="step", columns="representation", values=["peak_rss_mb", "wall_s"]
+        ).to_string(float_format="{:.1f}".format)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import time
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+import pandas as pd
+
+from utils.reduction import fit_pca, normalize, open_embeddings, project, truncation
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--mmap-file", type=str, default="data/embeddings.mmap")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument(
+        "--methods",
+        type=str,
+        nargs="+",
+        choices=["pca", "truncate"],
+        default=["pca", "truncate"],
+    )
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 384])
+    parser.add_argument("--rescore-limits", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-queries", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=8192)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report-file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def top_k(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    block_size: int,
+    exclude: np.ndarray,
+) -> np.ndarray:
+    best_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((queries.shape[0], k), dtype=np.int64)
+
+    for start in range(0, corpus.shape[0], block_size):
+        block = np.asarray(corpus[start : start + block_size])
+        scores = queries @ block.T
+        ids = np.arange(start, start + block.shape[0])
+        scores[ids[None, :] == exclude[:, None]] = -np.inf
+
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(ids, scores[:, k:].shape)], 1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_ids, order, axis=1)
+
+
+def rescore(
+    full: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int
+) -> np.ndarray:
+    ranked = np.empty((queries.shape[0], k), dtype=np.int64)
+    for idx, (query, ids) in enumerate(zip(queries, candidates)):
+        scores = full[ids] @ query
+        ranked[idx] = ids[np.argsort(-scores)[:k]]
+    return ranked
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = [len(set(f) & set(t)) for f, t in zip(found, truth)]
+    return float(np.sum(hits) / truth.size)
+
+
+def main() -> None:
+    args = parse_args()
+
+    embeddings = open_embeddings(args.mmap_file, args.embedding_dim)
+    n = embeddings.shape[0]
+    full = np.empty(embeddings.shape, dtype=np.float32)
+    for start in range(0, n, args.block_size):
+        full[start : start + args.block_size] = normalize(
+            np.asarray(embeddings[start : start + args.block_size])
+        )
+
+    rng = np.random.default_rng(args.seed)
+    query_ids = np.sort(rng.choice(n, size=min(args.n_queries, n), replace=False))
+    queries = full[query_ids]
+
+    start = time.perf_counter()
+    truth = top_k(full, queries, args.k, args.block_size, query_ids)
+    full_latency = (time.perf_counter() - start) / len(query_ids)
+
+    rows = [
+        {
+            "method": "full",
+            "dim": args.embedding_dim,
+            "rescore_limit": 0,
+            f"recall@{args.k}": 1.0,
+            "memory_mb": full.nbytes / 2**20,
+            "latency_ms": full_latency * 1000,
+        }
+    ]
+
+    for method in args.methods:
+        for dim in args.dims:
+            if method == "pca":
+                mean, components = fit_pca(embeddings, dim, args.block_size)
+            else:
+                mean, components = truncation(args.embedding_dim, dim)
+            reduced = project(full, mean, components)
+            reduced_queries = reduced[query_ids]
+
+            for limit in args.rescore_limits:
+                start = time.perf_counter()
+                found = top_k(
+                    reduced,
+                    reduced_queries,
+                    max(limit, args.k),
+                    args.block_size,
+                    query_ids,
+                )
+                if limit > 0:
+                    found = rescore(full, queries, found, args.k)
+                latency = (time.perf_counter() - start) / len(query_ids)
+
+                rows.append(
+                    {
+                        "method": method,
+                        "dim": dim,
+                        "rescore_limit": limit,
+                        f"recall@{args.k}": recall(found[:, : args.k], truth),
+                        "memory_mb": reduced.nbytes / 2**20,
+                        "latency_ms": latency * 1000,
+                    }
+                )
+
+    report_df = pd.DataFrame(rows)
+    print(report_df.to_string(index=False, float_format="{:.4f}".format))
+
+    if args.report_file is not None:
+        report_df.to_csv(args.report_file, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import time
+import uuid
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from qdrant_client import QdrantClient, models
+from tqdm.auto import tqdm
+
+from qdrant.search import embed_queries
+from utils.safe_eval import safe_eval
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--questions-file", type=str, default="data/questions.parquet")
+    parser.add_argument("--question-column", type=str, default="question")
+    parser.add_argument("--recipe-id-column", type=str, default="recipe_id")
+    parser.add_argument("--qdrant-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument(
+        "--collection-names",
+        type=str,
+        nargs="+",
+        default=["chefrag-ollama-bge-m3-567m-fp16"],
+    )
+    parser.add_argument("--strategies", type=str, nargs="+", default=None)
+    parser.add_argument(
+        "--ollama-api-url", type=str, default="http://localhost:11434/api/embed"
+    )
+    parser.add_argument("--ollama-model", type=str, default="bge-m3:567m-fp16")
+    parser.add_argument("--num-ctx", type=int, default=8192)
+    parser.add_argument("--k-values", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--fetch-limit", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--report-file", type=str, default="data/retrieval_eval.parquet"
+    )
+
+    args = parser.parse_args()
+    if args.strategies is not None and len(args.strategies) != len(
+        args.collection_names
+    ):
+        parser.error("--strategies must have one name per --collection-names")
+    return args
+
+
+def read_questions(filename: str) -> pd.DataFrame:
+    if filename.endswith(".csv"):
+        return pd.read_csv(filename)
+    return pd.read_parquet(filename)
+
+
+def relevant_ids(value: object) -> set[int]:
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return {int(v) for v in value}
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return set()
+    if isinstance(value, str):
+        parsed = safe_eval(value)
+        return relevant_ids(parsed) if isinstance(parsed, list) else {int(parsed)}
+    return {int(value)}
+
+
+def ranking_metrics(
+    ranked: list[int], relevant: set[int], k_values: list[int]
+) -> dict[str, float]:
+    metrics = {}
+
+    first_hit = next(
+        (rank for rank, rid in enumerate(ranked, start=1) if rid in relevant), None
+    )
+    metrics["mrr"] = 1.0 / first_hit if first_hit is not None else 0.0
+
+    for k in k_values:
+        top = ranked[:k]
+        hits = [rid in relevant for rid in top]
+        dcg = sum(1.0 / np.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+        idcg = sum(1.0 / np.log2(rank + 2) for rank in range(min(len(relevant), k)))
+
+        metrics[f"recall@{k}"] = sum(hits) / len(relevant)
+        metrics[f"ndcg@{k}"] = dcg / idcg
+
+    return metrics
+
+
+def collapse_recipes(points: list[models.ScoredPoint]) -> list[int]:
+    recipes = []
+    for point in points:
+        recipe_id = int((point.payload or {}).get("recipe_id", point.id))
+        if recipe_id not in recipes:
+            recipes.append(recipe_id)
+    return recipes
+
+
+def evaluate_batch(
+    client: QdrantClient,
+    args: Namespace,
+    collection_name: str,
+    questions: list[str],
+    relevant: list[set[int]],
+) -> list[dict[str, float]]:
+    start = time.perf_counter()
+    embeddings = embed_queries(
+        queries=questions,
+        api_url=args.ollama_api_url,
+        model=args.ollama_model,
+        num_ctx=args.num_ctx,
+    )
+    embed_time = time.perf_counter() - start
+
+    if embeddings is None:
+        return [
+            {**ranking_metrics([], question_relevant, args.k_values), "error": 1.0}
+            for question_relevant in relevant
+        ]
+
+    start = time.perf_counter()
+    responses = client.query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            models.QueryRequest(
+                query=embedding,
+                limit=args.fetch_limit,
+                with_payload=["recipe_id"],
+            )
+            for embedding in embeddings
+        ],
+    )
+    search_time = time.perf_counter() - start
+
+    rows = []
+    for response, question_relevant in zip(responses, relevant):
+        metrics = ranking_metrics(
+            ranked=collapse_recipes(response.points),
+            relevant=question_relevant,
+            k_values=args.k_values,
+        )
+        metrics["embed_ms"] = 1000 * embed_time / len(questions)
+        metrics["search_ms"] = 1000 * search_time / len(questions)
+        metrics["batch_embed_ms"] = 1000 * embed_time
+        metrics["batch_search_ms"] = 1000 * search_time
+        metrics["error"] = 0.0
+        rows.append(metrics)
+
+    return rows
+
+
+def evaluate_collection(
+    client: QdrantClient,
+    args: Namespace,
+    collection_name: str,
+    strategy: str,
+    questions_df: pd.DataFrame,
+) -> pd.DataFrame:
+    relevant = [relevant_ids(v) for v in questions_df[args.recipe_id_column]]
+    question_idx = [idx for idx, ids in enumerate(relevant) if ids]
+    if len(question_idx) < len(relevant):
+        print(
+            f"{collection_name}: skipped {len(relevant) - len(question_idx)} "
+            "questions without relevant recipes"
+        )
+    questions = [questions_df[args.question_column].iloc[i] for i in question_idx]
+    relevant = [relevant[i] for i in question_idx]
+    batch_starts = range(0, len(questions), args.batch_size)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                evaluate_batch,
+                client,
+                args,
+                collection_name,
+                questions[batch_start : batch_start + args.batch_size],
+                relevant[batch_start : batch_start + args.batch_size],
+            )
+            for batch_start in batch_starts
+        ]
+        rows = [
+            row
+            for future in tqdm(futures, desc=collection_name)
+            for row in future.result()
+        ]
+    wall_time = time.perf_counter() - start
+
+    report_df = pd.DataFrame(rows)
+    report_df.insert(0, "question_idx", question_idx)
+    report_df.insert(0, "strategy", strategy)
+    report_df.insert(0, "collection_name", collection_name)
+    report_df["qps"] = len(rows) / wall_time
+
+    return report_df
+
+
+def summarize(report_df: pd.DataFrame) -> pd.DataFrame:
+    metric_columns = [
+        column
+        for column in report_df.columns
+        if column.startswith(("recall@", "ndcg@"))
+        or column in ("mrr", "embed_ms", "search_ms", "qps")
+    ]
+    grouped = report_df.groupby(["run_id", "collection_name", "strategy"], sort=False)
+    summary_df = grouped[metric_columns].mean()
+    summary_df["errors"] = grouped["error"].sum()
+    return summary_df
+
+
+def markdown_table(summary_df: pd.DataFrame) -> str:
+    columns = ["Approach"] + summary_df.columns.to_list()
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "|".join(":---:" for _ in columns) + "|",
+    ]
+    for approach, row in summary_df.iterrows():
+        values = [f"{value:.4f}" for value in row.to_list()]
+        lines.append("| " + " | ".join([str(approach)] + values) + " |")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    args = parse_args()
+
+    client = QdrantClient(url=args.qdrant_api_url)
+    questions_df = read_questions(args.questions_file)
+
+    run_id = uuid.uuid4().hex[:8]
+    run_time = pd.Timestamp.now(tz="UTC")
+
+    strategies = args.strategies or args.collection_names
+
+    reports = []
+    for collection_name, strategy in zip(args.collection_names, strategies):
+        report_df = evaluate_collection(
+            client, args, collection_name, strategy, questions_df
+        )
+        report_df.insert(0, "run_time", run_time)
+        report_df.insert(0, "run_id", run_id)
+        reports.append(report_df)
+
+    report_df = pd.concat(reports, ignore_index=True)
+
+    report_file = Path(args.report_file)
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    if report_file.is_file():
+        report_df = pd.concat(
+            [pd.read_parquet(report_file), report_df], ignore_index=True
+        )
+    report_df.to_parquet(report_file, index=False)
+
+    summary_df = summarize(report_df[report_df["run_id"] == run_id])
+    print(markdown_table(summary_df.droplevel(["run_id", "collection_name"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import json
+import time
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+
+import pandas as pd
+import requests
+from qdrant_client import QdrantClient
+
+from qdrant.chat import Retriever
+from utils.doc_store import DocStore
+from utils.intent import INTENTS, TitleIndex
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--chat-log", type=str, required=True)
+    parser.add_argument("--qdrant-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument("--qdrant-path", type=str, default=None)
+    parser.add_argument(
+        "--qdrant-collection-name",
+        type=str,
+        default="chefrag-ollama-bge-m3-567m-fp16",
+    )
+    parser.add_argument(
+        "--ollama-api-url", type=str, default="http://localhost:11434/api/embed"
+    )
+    parser.add_argument("--ollama-model", type=str, default="bge-m3:567m-fp16")
+    parser.add_argument("--num-ctx", type=int, default=8192)
+    parser.add_argument("--topk", type=int, default=4)
+    parser.add_argument("--title-index", type=str, default="data/title_index.npz")
+    parser.add_argument("--doc-store", type=str, default=None)
+    parser.add_argument("--output-file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def read_conversations(filename: str) -> list[list[str]]:
+    conversations, turns = [], []
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                turns.append(line.strip())
+            elif turns:
+                conversations.append(turns)
+                turns = []
+    if turns:
+        conversations.append(turns)
+    return conversations
+
+
+def replay(
+    args: Namespace, conversations: list[list[str]], calls: Counter
+) -> list[dict]:
+    client = (
+        QdrantClient(path=args.qdrant_path)
+        if args.qdrant_path is not None
+        else QdrantClient(url=args.qdrant_api_url)
+    )
+    session = requests.Session()
+    doc_store = DocStore(args.doc_store) if args.doc_store is not None else None
+    title_index = (
+        TitleIndex.load(args.title_index) if args.title_index is not None else None
+    )
+
+    records = []
+    for conversation_idx, turns in enumerate(conversations):
+        retriever = Retriever(
+            client=client,
+            session=session,
+            collection_name=args.qdrant_collection_name,
+            ollama_api_url=args.ollama_api_url,
+            ollama_model=args.ollama_model,
+            num_ctx=args.num_ctx,
+            topk=args.topk,
+            route_intents=True,
+            doc_store=doc_store,
+            title_index=title_index,
+            calls=calls,
+        )
+        for question in turns:
+            start = time.perf_counter()
+            intent, recipes = retriever.retrieve(question)
+            records.append(
+                {
+                    "conversation": conversation_idx,
+                    "question": question,
+                    "intent": intent,
+                    "recipe_ids": [recipe_id for recipe_id, _ in recipes or []],
+                    "retrieve_ms": (time.perf_counter() - start) * 1e3,
+                }
+            )
+    return records
+
+
+def main() -> None:
+    args = parse_args()
+
+    calls = Counter()
+    records = replay(args, read_conversations(args.chat_log), calls)
+
+    if args.output_file is not None:
+        with open(args.output_file, "w") as f:
+            f.writelines(
+                json.dumps(record, ensure_ascii=False) + "\n" for record in records
+            )
+
+    turns = len(records)
+    print(
+        pd.DataFrame(
+            {
+                "intent": INTENTS,
+                "turns": [calls[intent] for intent in INTENTS],
+                "share": [calls[intent] / max(turns, 1) for intent in INTENTS],
+            }
+        ).to_string(index=False, float_format="{:.3f}".format)
+    )
+    for name, key in [("embedding", "embed"), ("ANN", "ann")]:
+        saved = turns - calls[key]
+        print(
+            f"{name} calls: {turns} -> {calls[key]} "
+            f"(saved {saved}, {saved / max(turns, 1):.1%})"
+        )
+    print(f"title payload lookups: {calls['payload_lookup']}")
+    print(
+        "mean retrieval time: "
+        f"{sum(r['retrieve_ms'] for r in records) / max(turns, 1):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import json
+import sys
+import tempfile
+import threading
+from argparse import ArgumentParser, Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from benchmark.recipe_store_memory import run_measured
+from benchmark.synthetic_corpus import (
+    CorpusStats,
+    default_stats,
+    fit_stats,
+    write_corpus,
+)
+from utils.embedders import StubEmbedder
+
+VECTORIZE_COLUMNS = {
+    "all_kinds": "chunk_text",
+    "recipe_and_ingredients": "chunk_text",
+    "full_recipe": "chunk",
+}
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--source-filename", type=str, default=None)
+    parser.add_argument(
+        "--strategy",
+        type=str,
+        choices=list(VECTORIZE_COLUMNS),
+        default="all_kinds",
+    )
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--num-queries", type=int, default=256)
+    parser.add_argument(
+        "--stages",
+        type=str,
+        nargs="+",
+        choices=["create_chunks", "vectorize_chunks", "upload", "search"],
+        default=["create_chunks", "vectorize_chunks", "upload", "search"],
+    )
+    parser.add_argument("--work-folder", type=str, default=None)
+    parser.add_argument("--results-file", type=str, default=None)
+    parser.add_argument("--baseline-file", type=str, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--extrapolate-chunks", type=int, nargs="+", default=[1000000, 10000000]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+    return parser.parse_args()
+
+
+def stub_ollama_server(dim: int) -> ThreadingHTTPServer:
+    embedder = StubEmbedder(dim=dim)
+
+    class StubOllamaHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = request["input"]
+            if isinstance(texts, str):
+                texts = [texts]
+            body = json.dumps({"embeddings": embedder.encode(texts).tolist()}).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stage_commands(
+    args: Namespace, folder: Path, corpus_file: Path, api_url: str
+) -> dict[str, tuple[str, list[str]]]:
+    chunks_file = folder / f"{args.strategy}_chunks.parquet"
+    mmap_file = folder / f"{args.strategy}_embeddings.mmap"
+    qdrant_path = folder / "qdrant"
+    collection_name = f"chefrag-{args.strategy}"
+
+    return {
+        "create_chunks": (
+            "chunks/create_chunks.py",
+            [
+                "--raw-filename",
+                str(corpus_file),
+                "--chunks-folder",
+                str(folder),
+                "--strategies",
+                args.strategy,
+            ],
+        ),
+        "vectorize_chunks": (
+            "chunks/vectorize_chunks.py",
+            [
+                "--api-url",
+                api_url,
+                "--chunks-file",
+                str(chunks_file),
+                "--vectorize-column",
+                VECTORIZE_COLUMNS[args.strategy],
+                "--mmap-file",
+                str(mmap_file),
+                "--embedding-dim",
+                str(args.embedding_dim),
+                "--workers",
+                str(args.workers),
+            ],
+        ),
+        "upload": (
+            "qdrant/upload.py",
+            [
+                "--client-path",
+                str(qdrant_path),
+                "--collection-name",
+                collection_name,
+                "--embedding-dim",
+                str(args.embedding_dim),
+                "--chunks-file",
+                str(chunks_file),
+                "--chunks-mmap",
+                str(mmap_file),
+            ],
+        ),
+        "search": (
+            "qdrant/search.py",
+            [
+                "--queries-file",
+                str(folder / "queries.txt"),
+                "--output-file",
+                str(folder / "search_results.jsonl"),
+                "--qdrant-path",
+                str(qdrant_path),
+                "--qdrant-collection-name",
+                collection_name,
+                "--ollama-api-url",
+                api_url,
+            ],
+        ),
+    }
+
+
+def write_queries(corpus_file: Path, filename: Path, num_queries: int) -> None:
+    titles = pd.read_csv(corpus_file, usecols=["title"], nrows=num_queries)["title"]
+    with open(filename, "w") as f:
+        f.writelines(f"{title}\n" for title in titles.dropna())
+
+
+def stage_items(
+    name: str, num_recipes: int, chunks_file: Path, queries_file: Path
+) -> int:
+    if name == "create_chunks":
+        return num_recipes
+    if name == "search":
+        with open(queries_file) as f:
+            return sum(1 for _ in f)
+    return pq.ParquetFile(chunks_file).metadata.num_rows
+
+
+def run_scale(
+    args: Namespace,
+    stats: CorpusStats,
+    folder: Path,
+    num_recipes: int,
+    api_url: str,
+) -> list[dict]:
+    folder.mkdir(parents=True, exist_ok=True)
+    corpus_file = folder / "recipes_texts.csv"
+    write_corpus(stats, corpus_file, num_recipes, seed=args.seed)
+    write_queries(corpus_file, folder / "queries.txt", args.num_queries)
+
+    chunks_file = folder / f"{args.strategy}_chunks.parquet"
+    records = []
+    commands = stage_commands(args, folder, corpus_file, api_url)
+    for name in args.stages:
+        script, script_args = commands[name]
+        peak_rss_mb, wall_s = run_measured(script, script_args)
+        items = stage_items(name, num_recipes, chunks_file, folder / "queries.txt")
+        records.append(
+            {
+                "stage": name,
+                "recipes": num_recipes,
+                "chunks": pq.ParquetFile(chunks_file).metadata.num_rows,
+                "items": items,
+                "wall_s": wall_s,
+                "items_per_s": items / wall_s,
+                "peak_rss_mb": peak_rss_mb,
+            }
+        )
+        print(records[-1])
+
+    return records
+
+
+def scaling_curves(
+    results_df: pd.DataFrame, extrapolate_chunks: list[int]
+) -> pd.DataFrame:
+    rows = []
+    for name, stage_df in results_df.groupby("stage", sort=False):
+        stage_df = stage_df.sort_values("chunks")
+        row = {"stage": name}
+        if stage_df.shape[0] > 1:
+            chunks = stage_df["chunks"].to_numpy(dtype=np.float64)
+            time_exponent, time_intercept = np.polyfit(
+                np.log(chunks), np.log(stage_df["wall_s"]), 1
+            )
+            rss_slope, rss_intercept = np.polyfit(chunks, stage_df["peak_rss_mb"], 1)
+            row["time_exponent"] = time_exponent
+            row["rss_mb_per_1m_chunks"] = rss_slope * 1e6
+            for target in extrapolate_chunks:
+                row[f"wall_s@{target}"] = np.exp(time_intercept) * target**time_exponent
+                row[f"peak_rss_mb@{target}"] = rss_intercept + rss_slope * target
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def find_regressions(
+    results_df: pd.DataFrame, baseline_df: pd.DataFrame, tolerance: float
+) -> pd.DataFrame:
+    merged = results_df.merge(
+        baseline_df, on=["stage", "recipes"], suffixes=("", "_baseline")
+    )
+    slower = merged["items_per_s"] < merged["items_per_s_baseline"] * (1 - tolerance)
+    larger = merged["peak_rss_mb"] > merged["peak_rss_mb_baseline"] * (1 + tolerance)
+    return merged.loc[
+        slower | larger,
+        [
+            "stage",
+            "recipes",
+            "items_per_s",
+            "items_per_s_baseline",
+            "peak_rss_mb",
+            "peak_rss_mb_baseline",
+        ],
+    ]
+
+
+def benchmark(args: Namespace, work_folder: Path) -> pd.DataFrame:
+    stats = (
+        fit_stats(args.source_filename, 20000, 20000)
+        if args.source_filename is not None
+        else default_stats(np.random.default_rng(args.seed))
+    )
+
+    server = stub_ollama_server(args.embedding_dim)
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/api/embed"
+    try:
+        records = []
+        for num_recipes in sorted(args.scales):
+            records += run_scale(
+                args, stats, work_folder / str(num_recipes), num_recipes, api_url
+            )
+    finally:
+        server.shutdown()
+
+    return pd.DataFrame(records)
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.work_folder is not None:
+        results_df = benchmark(args, Path(args.work_folder))
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            results_df = benchmark(args, Path(folder))
+
+    print(results_df.to_string(index=False, float_format="{:.1f}".format))
+    print(
+        scaling_curves(results_df, args.extrapolate_chunks).to_string(
+            index=False, float_format="{:.2f}".format
+        )
+    )
+
+    if args.results_file is not None:
+        results_df.to_json(args.results_file, orient="records", indent=4)
+
+    if args.baseline_file is not None:
+        regressions_df = find_regressions(
+            results_df, pd.read_json(args.baseline_file), args.tolerance
+        )
+        if regressions_df.shape[0] > 0:
+            print("Regressions:")
+            print(regressions_df.to_string(index=False, float_format="{:.1f}".format))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
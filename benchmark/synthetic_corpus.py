@@ -0,0 +1,235 @@
+import csv
+import re
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from utils.recipe_store import parse_list
+
+DISH_WORDS = [
+    "суп", "салат", "пирог", "котлеты", "запеканка", "блины", "оладьи", "рагу",
+    "плов", "борщ", "каша", "омлет", "пирожки", "торт", "печенье", "соус",
+    "паста", "гуляш", "жаркое", "кекс", "маффины", "лазанья", "пицца", "щи",
+]  # fmt: skip
+
+COOKING_WORDS = [
+    "нарезать", "добавить", "обжарить", "смешать", "варить", "запекать",
+    "посолить", "поперчить", "перемешать", "выложить", "залить", "довести",
+    "до", "кипения", "минут", "на", "в", "с", "и", "среднем", "огне", "духовке",
+    "сковороде", "кастрюле", "мелко", "кубиками", "соломкой", "готовности",
+    "остудить", "подавать", "украсить", "зеленью", "тесто", "начинку",
+    "градусов", "крышкой", "под", "затем", "после", "этого", "все",
+]  # fmt: skip
+
+INGREDIENT_NAMES = [
+    "мука", "сахар", "соль", "яйцо куриное", "молоко", "масло сливочное",
+    "масло растительное", "лук репчатый", "морковь", "картофель", "чеснок",
+    "перец черный молотый", "сметана", "сыр твердый", "помидоры", "огурцы",
+    "куриное филе", "говядина", "свинина", "рис", "гречка", "капуста белокочанная",
+    "свекла", "укроп", "петрушка", "разрыхлитель", "ванильный сахар", "творог",
+    "кефир", "грибы шампиньоны", "майонез", "лимон", "мед", "какао",
+]  # fmt: skip
+
+UNITS = ["г", "шт", "мл", "ст. л.", "ч. л.", "стакан", "зубч.", "по вкусу"]
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--source-filename", type=str, default=None)
+    parser.add_argument("--sample-rows", type=int, default=20000)
+    parser.add_argument("--vocab-size", type=int, default=20000)
+    parser.add_argument("--num-recipes", type=int, default=100000)
+    parser.add_argument(
+        "--output-filename", type=str, default="data/recipes_texts_synthetic.csv"
+    )
+    parser.add_argument("--block-rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+
+    return parser.parse_args()
+
+
+@dataclass
+class CorpusStats:
+    title_words: np.ndarray
+    description_words: np.ndarray
+    ingredient_counts: np.ndarray
+    step_counts: np.ndarray
+    step_words: np.ndarray
+    words: np.ndarray
+    word_weights: np.ndarray
+    ingredients: np.ndarray
+    ingredient_weights: np.ndarray
+
+
+def zipf_weights(size: int) -> np.ndarray:
+    weights = 1 / np.arange(1, size + 1)
+    return weights / weights.sum()
+
+
+def frequencies(counter: Counter, size: int) -> tuple[np.ndarray, np.ndarray]:
+    values, counts = zip(*counter.most_common(size))
+    weights = np.array(counts, dtype=np.float64)
+    return np.array(values, dtype=object), weights / weights.sum()
+
+
+def default_stats(rng: np.random.Generator, samples: int = 10000) -> CorpusStats:
+    words = np.array(DISH_WORDS + COOKING_WORDS + INGREDIENT_NAMES, dtype=object)
+    ingredients = np.array(
+        [
+            f"{name} - {quantity} {unit}"
+            for name in INGREDIENT_NAMES
+            for quantity, unit in zip([1, 2, 100, 200, 500], UNITS)
+        ],
+        dtype=object,
+    )
+    description_words = rng.poisson(25, samples)
+    description_words[rng.random(samples) < 0.3] = 0
+
+    return CorpusStats(
+        title_words=rng.poisson(2, samples) + 1,
+        description_words=description_words,
+        ingredient_counts=rng.poisson(7, samples) + 1,
+        step_counts=rng.poisson(5, samples) + 1,
+        step_words=rng.poisson(15, samples) + 2,
+        words=rng.permutation(words),
+        word_weights=zipf_weights(words.shape[0]),
+        ingredients=rng.permutation(ingredients),
+        ingredient_weights=zipf_weights(ingredients.shape[0]),
+    )
+
+
+def word_count(text: str | None) -> int:
+    return len(re.findall(r"\w+", text)) if isinstance(text, str) else 0
+
+
+def fit_stats(filename: str, sample_rows: int, vocab_size: int) -> CorpusStats:
+    raw_df = pd.read_csv(filename, nrows=sample_rows)
+    ingredients = [parse_list(v) for v in raw_df["ingredients"].where(pd.notna, None)]
+    steps = [parse_list(v) for v in raw_df["recipe"].where(pd.notna, None)]
+
+    word_counter = Counter()
+    for column in ["title", "description"]:
+        for text in raw_df[column].dropna():
+            word_counter.update(re.findall(r"\w+", str(text)))
+    for recipe_steps in steps:
+        for step in recipe_steps:
+            word_counter.update(re.findall(r"\w+", step))
+
+    words, word_weights = frequencies(word_counter, vocab_size)
+    ingredient_values, ingredient_weights = frequencies(
+        Counter(i for recipe_ingredients in ingredients for i in recipe_ingredients),
+        vocab_size,
+    )
+    step_words = [word_count(step) for recipe_steps in steps for step in recipe_steps]
+
+    return CorpusStats(
+        title_words=np.array([max(word_count(t), 1) for t in raw_df["title"]]),
+        description_words=np.array([word_count(d) for d in raw_df["description"]]),
+        ingredient_counts=np.array([len(i) for i in ingredients]),
+        step_counts=np.array([len(s) for s in steps]),
+        step_words=np.array([max(c, 1) for c in step_words] or [1]),
+        words=words,
+        word_weights=word_weights,
+        ingredients=ingredient_values,
+        ingredient_weights=ingredient_weights,
+    )
+
+
+def split_by_counts(values: np.ndarray, counts: np.ndarray) -> list[list]:
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    values = values.tolist()
+    return [values[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def sample_texts(
+    rng: np.random.Generator, stats: CorpusStats, counts: np.ndarray
+) -> list[str]:
+    tokens = rng.choice(stats.words, size=int(counts.sum()), p=stats.word_weights)
+    return [" ".join(words) for words in split_by_counts(tokens, counts)]
+
+
+def generate_recipes(
+    stats: CorpusStats, num_recipes: int, block_rows: int, seed: int
+) -> Iterator[list[list]]:
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, num_recipes, block_rows):
+        n = min(block_rows, num_recipes - start)
+
+        titles = sample_texts(rng, stats, rng.choice(stats.title_words, n))
+        description_counts = rng.choice(stats.description_words, n)
+        descriptions = sample_texts(rng, stats, description_counts)
+
+        ingredient_counts = rng.choice(stats.ingredient_counts, n)
+        ingredients = split_by_counts(
+            rng.choice(
+                stats.ingredients,
+                size=int(ingredient_counts.sum()),
+                p=stats.ingredient_weights,
+            ),
+            ingredient_counts,
+        )
+
+        step_counts = rng.choice(stats.step_counts, n)
+        step_texts = sample_texts(
+            rng, stats, rng.choice(stats.step_words, int(step_counts.sum()))
+        )
+        steps = split_by_counts(
+            np.array([f"{text}." for text in step_texts], dtype=object), step_counts
+        )
+
+        yield [
+            [
+                f"https://example.com/recipes/{start + idx}/",
+                f"https://example.com/images/{start + idx}.jpg",
+                titles[idx],
+                descriptions[idx] if description_counts[idx] else None,
+                ingredients[idx],
+                steps[idx],
+            ]
+            for idx in range(n)
+        ]
+
+
+def write_corpus(
+    stats: CorpusStats,
+    filename: str | Path,
+    num_recipes: int,
+    block_rows: int = 10000,
+    seed: int = 0,
+) -> None:
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    with open(filename, "w", newline="") as f:
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(
+            ["link", "image_link", "title", "description", "ingredients", "recipe"]
+        )
+        for rows in tqdm(
+            generate_recipes(stats, num_recipes, block_rows, seed),
+            total=-(-num_recipes // block_rows),
+        ):
+            csv_writer.writerows(rows)
+
+
+def main() -> None:
+    args = parse_args()
+
+    stats = (
+        fit_stats(args.source_filename, args.sample_rows, args.vocab_size)
+        if args.source_filename is not None
+        else default_stats(np.random.default_rng(args.seed))
+    )
+    write_corpus(
+        stats, args.output_filename, args.num_recipes, args.block_rows, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
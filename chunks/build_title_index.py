@@ -0,0 +1,58 @@
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+import pandas as pd
+
+from utils.intent import TitleIndex
+from utils.profiler import add_profiler_args, profile_run, stage
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "--pages-filename", type=str, default="data/recipes_pages_clean.csv"
+    )
+    parser.add_argument(
+        "--clean-filename", type=str, default="data/recipes_texts_clean.csv"
+    )
+    parser.add_argument("--index-filename", type=str, default="data/title_index.npz")
+    parser.add_argument("--separator", type=str, default=",")
+    add_profiler_args(parser)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        with stage("read_csv") as stats:
+            pages_df = pd.read_csv(
+                args.pages_filename, sep=args.separator, usecols=["title", "link"]
+            )
+            clean_df = pd.read_csv(args.clean_filename, sep=args.separator)
+            stats.add(items=pages_df.shape[0] + clean_df.shape[0])
+        if "recipe_id" not in clean_df.columns:
+            clean_df["recipe_id"] = np.arange(clean_df.shape[0])
+
+        with stage("build_title_index") as stats:
+            titles_df = pages_df.merge(
+                clean_df[["link", "recipe_id"]], on="link", how="inner"
+            ).dropna(subset=["title"])
+            index = TitleIndex.build(
+                titles_df["title"].astype(str).to_list(),
+                titles_df["recipe_id"].astype(int).to_list(),
+            )
+            stats.add(items=len(index.hashes))
+
+        index.save(args.index_filename)
+
+        print(
+            f"{len(index.hashes)} titles, {len(np.unique(index.hashes))} unique, "
+            f"{pages_df.shape[0] - titles_df.shape[0]} pages without recipe"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 import json
 import re
 from argparse import ArgumentParser, Namespace
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from utils.delta import (
+    compute_changeset,
+    read_recipe_state,
+    recipe_hashes,
+    updated_links,
+)
+from utils.profiler import add_profiler_args, profile_run, stage
+from utils.recipe_store import clean_store, read_csv_store, write_store
 from utils.safe_eval import safe_eval
 
 
@@ -18,8 +28,17 @@ def parse_args() -> Namespace:
         "--stop-chars-filename", type=str, default="data/stop_chars.json"
     )
     parser.add_argument("--separator", type=str, default=",")
+    parser.add_argument("--delta-file", type=str, default=None)
+    parser.add_argument(
+        "--recipe-state-file", type=str, default="data/recipes_state.parquet"
+    )
+    parser.add_argument("--store-file", type=str, default=None)
+    add_profiler_args(parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.store_file is not None and args.delta_file is not None:
+        parser.error("--store-file doesn't support --delta-file")
+    return args
 
 
 def clean_text(text: str, chars_to_remove: list[str]) -> str:
@@ -33,26 +52,167 @@ def clean_list(lst: list[str], chars_to_remove: list[str]) -> list[str]:
     return [clean_text(item, chars_to_remove) for item in lst]
 
 
-def clean() -> None:
-    args = parse_args()
-    raw_df = pd.read_csv(args.raw_filename, sep=args.separator)
+def has_recipe_ids(filename: str, separator: str) -> bool:
+    if not Path(filename).is_file():
+        return False
+    return "recipe_id" in pd.read_csv(filename, sep=separator, nrows=0).columns
 
-    raw_df["ingredients"] = raw_df["ingredients"].apply(safe_eval)
-    raw_df["recipe"] = raw_df["recipe"].apply(safe_eval)
 
-    with open(args.stop_chars_filename) as f:
-        chars_to_remove = json.load(f)
+def select_changed(
+    raw_df: pd.DataFrame, args: Namespace
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    state_df = read_recipe_state(args.recipe_state_file)
+    if state_df.shape[0] and not has_recipe_ids(args.clean_filename, args.separator):
+        raise ValueError(
+            f"{args.clean_filename} wasn't built in delta mode, "
+            f"remove {args.recipe_state_file} to rebuild it from scratch"
+        )
+
+    raw_df = raw_df.drop_duplicates(subset="link", keep="last")
+    changeset_df, state_df = compute_changeset(
+        links=raw_df["link"],
+        hashes=recipe_hashes(raw_df),
+        state_df=state_df,
+    )
 
-    raw_df["title"] = raw_df["title"].apply(lambda x: clean_text(x, chars_to_remove))
-    raw_df["description"] = raw_df["description"].apply(
-        lambda x: clean_text(x, chars_to_remove)
+    raw_df = raw_df[raw_df["link"].isin(updated_links(changeset_df))].copy()
+    raw_df["recipe_id"] = raw_df["link"].map(state_df.set_index("link")["recipe_id"])
+    print(f"changeset: {changeset_df['status'].value_counts().to_dict()}")
+
+    return raw_df, changeset_df, state_df
+
+
+def needs_seed(args: Namespace) -> bool:
+    return (
+        not Path(args.recipe_state_file).is_file()
+        and Path(args.clean_filename).is_file()
+        and not has_recipe_ids(args.clean_filename, args.separator)
+    )
+
+
+def seed_changeset(
+    raw_df: pd.DataFrame, raw_hashes: pd.Series, args: Namespace
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    clean_df = pd.read_csv(args.clean_filename, sep=args.separator)
+    clean_df["recipe_id"] = np.arange(clean_df.shape[0])
+    clean_df["hash"] = recipe_hashes(clean_df)
+    kept_df = clean_df.drop_duplicates(subset="link", keep="last")
+    duplicates_df = clean_df.loc[
+        ~clean_df.index.isin(kept_df.index), ["link", "recipe_id", "hash"]
+    ]
+
+    changeset_df, state_df = compute_changeset(
+        links=raw_df["link"],
+        hashes=recipe_hashes(raw_df),
+        state_df=kept_df[["link", "recipe_id", "hash"]],
     )
-    raw_df["ingredients"] = raw_df["ingredients"].apply(
-        lambda x: clean_list(x, chars_to_remove)
+    changeset_df = pd.concat(
+        [changeset_df, duplicates_df.assign(status="removed")], ignore_index=True
     )
-    raw_df["recipe"] = raw_df["recipe"].apply(lambda x: clean_list(x, chars_to_remove))
 
-    raw_df.to_csv(args.clean_filename, index=False)
+    hashes = pd.Series(raw_hashes.to_numpy(), index=raw_df["link"].to_numpy())
+    updated = changeset_df["status"] != "removed"
+    changeset_df.loc[updated, "hash"] = changeset_df.loc[updated, "link"].map(hashes)
+    state_df["hash"] = state_df["link"].map(hashes)
+
+    raw_df = raw_df.copy()
+    raw_df["recipe_id"] = raw_df["link"].map(state_df.set_index("link")["recipe_id"])
+    print(f"changeset: {changeset_df['status'].value_counts().to_dict()}")
+
+    return raw_df.sort_values("recipe_id"), changeset_df, state_df
+
+
+def merge_changed(
+    raw_df: pd.DataFrame, changeset_df: pd.DataFrame, args: Namespace
+) -> pd.DataFrame:
+    if not has_recipe_ids(args.clean_filename, args.separator):
+        return raw_df
+
+    clean_df = pd.read_csv(args.clean_filename, sep=args.separator)
+    clean_df = clean_df[~clean_df["link"].isin(changeset_df["link"])]
+    return pd.concat([clean_df, raw_df]).sort_values("recipe_id")
+
+
+def clean_to_store(args: Namespace) -> None:
+    with stage("read_csv") as stats:
+        table = read_csv_store(args.raw_filename, args.separator)
+        stats.add(items=table.num_rows, bytes=Path(args.raw_filename).stat().st_size)
+
+    with open(args.stop_chars_filename) as f:
+        chars_to_remove = json.load(f)
+
+    with stage("clean_text") as stats:
+        table = clean_store(table, chars_to_remove)
+        stats.add(items=table.num_rows, bytes=table.nbytes)
+
+    with stage("write_store") as stats:
+        write_store(table, args.store_file)
+        stats.add(items=table.num_rows, bytes=Path(args.store_file).stat().st_size)
+
+
+def clean() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        if args.store_file is not None:
+            clean_to_store(args)
+            return
+
+        with stage("read_csv") as stats:
+            raw_df = pd.read_csv(args.raw_filename, sep=args.separator)
+            stats.add(
+                items=raw_df.shape[0], bytes=Path(args.raw_filename).stat().st_size
+            )
+
+        seed = args.delta_file is not None and needs_seed(args)
+        if seed:
+            raw_df = raw_df.drop_duplicates(subset="link", keep="last")
+            raw_hashes = recipe_hashes(raw_df)
+        elif args.delta_file is not None:
+            with stage("changeset") as stats:
+                raw_df, changeset_df, state_df = select_changed(raw_df, args)
+                stats.add(items=changeset_df.shape[0])
+
+        with stage("safe_eval") as stats:
+            raw_df["ingredients"] = raw_df["ingredients"].apply(safe_eval)
+            raw_df["recipe"] = raw_df["recipe"].apply(safe_eval)
+            stats.add(items=raw_df.shape[0])
+
+        with open(args.stop_chars_filename) as f:
+            chars_to_remove = json.load(f)
+
+        with stage("clean_text") as stats:
+            raw_df["title"] = raw_df["title"].apply(
+                lambda x: clean_text(x, chars_to_remove)
+            )
+            raw_df["description"] = raw_df["description"].apply(
+                lambda x: clean_text(x, chars_to_remove)
+            )
+            raw_df["ingredients"] = raw_df["ingredients"].apply(
+                lambda x: clean_list(x, chars_to_remove)
+            )
+            raw_df["recipe"] = raw_df["recipe"].apply(
+                lambda x: clean_list(x, chars_to_remove)
+            )
+            stats.add(items=raw_df.shape[0])
+
+        if seed:
+            with stage("changeset") as stats:
+                raw_df, changeset_df, state_df = seed_changeset(
+                    raw_df, raw_hashes, args
+                )
+                stats.add(items=changeset_df.shape[0])
+        elif args.delta_file is not None:
+            raw_df = merge_changed(raw_df, changeset_df, args)
+        if args.delta_file is not None:
+            changeset_df.to_parquet(args.delta_file, index=False)
+            state_df.to_parquet(args.recipe_state_file, index=False)
+
+        with stage("write_csv") as stats:
+            raw_df.to_csv(args.clean_filename, index=False)
+            stats.add(
+                items=raw_df.shape[0], bytes=Path(args.clean_filename).stat().st_size
+            )
 
 
 if __name__ == "__main__":
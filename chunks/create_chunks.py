@@ -1,10 +1,23 @@
 import re
 from argparse import ArgumentParser, Namespace
-from pathlib import Path, PurePath
+from pathlib import Path
+from typing import Callable
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm.auto import tqdm
 
+from utils.delta import (
+    affected_recipe_ids,
+    allocate_chunk_ids,
+    chunk_ids,
+    read_changeset,
+    updated_links,
+    write_chunk_delta,
+)
+from utils.profiler import add_profiler_args, profile_run, stage
+from utils.recipe_store import open_store, recipe_frames
 from utils.safe_eval import safe_eval
 
 
@@ -16,15 +29,43 @@ def parse_args() -> Namespace:
     )
     parser.add_argument("--chunks-folder", type=str, default="data")
     parser.add_argument("--separator", type=str, default=",")
-
-    return parser.parse_args()
-
-
-def full_recipe_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -> None:
-    chunk_idx = 0
-    chunk_dct = {"id": [], "chunk": [], "full_recipe": []}
-
-    for _, r in enumerate(tqdm(raw_df.iterrows(), total=raw_df.shape[0])):
+    parser.add_argument(
+        "--strategies",
+        type=str,
+        nargs="+",
+        choices=["all_kinds", "recipe_and_ingredients", "full_recipe"],
+        default=["all_kinds", "recipe_and_ingredients", "full_recipe"],
+    )
+    parser.add_argument("--delta-file", type=str, default=None)
+    parser.add_argument("--canonical-only", action="store_true")
+    parser.add_argument("--store-file", type=str, default=None)
+    parser.add_argument("--batch-rows", type=int, default=8192)
+    add_profiler_args(parser)
+
+    args = parser.parse_args()
+    if args.store_file is not None and args.delta_file is not None:
+        parser.error("--store-file doesn't support --delta-file")
+    if args.store_file is not None and args.canonical_only:
+        parser.error(
+            "--store-file doesn't support --canonical-only, store is built from "
+            "raw recipes without is_canonical column"
+        )
+    return args
+
+
+def recipe_ids(raw_df: pd.DataFrame) -> list[int]:
+    if "recipe_id" in raw_df.columns:
+        return raw_df["recipe_id"].astype(int).to_list()
+    return list(range(raw_df.shape[0]))
+
+
+def full_recipe_chunks(raw_df: pd.DataFrame, chunk_offset: int = 0) -> pd.DataFrame:
+    chunk_idx = chunk_offset
+    chunk_dct = {"id": [], "recipe_id": [], "chunk": [], "full_recipe": []}
+
+    for recipe_id, r in zip(
+        recipe_ids(raw_df), tqdm(raw_df.iterrows(), total=raw_df.shape[0])
+    ):
         row = r[1]
 
         name = row["title"]
@@ -56,20 +97,22 @@ def full_recipe_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -> None:
         full_recipe_text = "\n".join(full_recipe)
 
         chunk_dct["id"].append(chunk_idx)
+        chunk_dct["recipe_id"].append(recipe_id)
         chunk_dct["chunk"].append(full_recipe_text)
         chunk_dct["full_recipe"].append(full_recipe_text)
 
         chunk_idx += 1
 
-    chunk_df = pd.DataFrame(chunk_dct)
-    chunk_df.to_parquet(save_folder / "full_recipe_chunks.parquet")
+    return pd.DataFrame(chunk_dct)
 
 
-def all_kinds_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -> None:
-    chunk_idx = 0
+def all_kinds_chunks(raw_df: pd.DataFrame, chunk_offset: int = 0) -> pd.DataFrame:
+    chunk_idx = chunk_offset
     chunk_list = []
 
-    for recipe_id, row in enumerate(tqdm(raw_df.iterrows(), total=raw_df.shape[0])):
+    for recipe_id, row in zip(
+        recipe_ids(raw_df), tqdm(raw_df.iterrows(), total=raw_df.shape[0])
+    ):
         row = row[1]
         title = row["title"]
         description = row["description"]
@@ -161,15 +204,18 @@ def all_kinds_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -> None:
                 )
                 chunk_idx += 1
 
-    chunk_df = pd.DataFrame(chunk_list)
-    chunk_df.to_parquet(save_folder / "all_kinds_chunks.parquet")
+    return pd.DataFrame(chunk_list)
 
 
-def recipe_and_ingredients_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -> None:
+def recipe_and_ingredients_chunks(
+    raw_df: pd.DataFrame, chunk_offset: int = 0
+) -> pd.DataFrame:
     chunk_list = []
-    chunk_idx = 0
+    chunk_idx = chunk_offset
 
-    for recipe_id, row in enumerate(tqdm(raw_df.iterrows(), total=raw_df.shape[0])):
+    for recipe_id, row in zip(
+        recipe_ids(raw_df), tqdm(raw_df.iterrows(), total=raw_df.shape[0])
+    ):
         row = row[1]
         title = row["title"]
         description = row["description"]
@@ -243,24 +289,157 @@ def recipe_and_ingredients_chunks(raw_df: pd.DataFrame, save_folder: PurePath) -
             )
             chunk_idx += 1
 
-    chunk_df = pd.DataFrame(chunk_list)
-    chunk_df.to_parquet(save_folder / "recipe_and_ingredients_chunks.parquet")
+    return pd.DataFrame(chunk_list)
+
+
+def build_chunks(
+    builder: Callable[..., pd.DataFrame], raw_df: pd.DataFrame, chunk_offset: int = 0
+) -> pd.DataFrame:
+    chunk_df = builder(raw_df, chunk_offset=chunk_offset)
+    if "cluster_id" in raw_df.columns and chunk_df.shape[0] > 0:
+        clusters = dict(zip(recipe_ids(raw_df), raw_df["cluster_id"].astype(int)))
+        chunk_df["cluster_id"] = chunk_df["recipe_id"].map(clusters)
+    return chunk_df
+
+
+def save_chunks(
+    builder: Callable[..., pd.DataFrame],
+    raw_df: pd.DataFrame,
+    filename: Path,
+    changeset_df: pd.DataFrame | None,
+) -> None:
+    if changeset_df is None:
+        build_chunks(builder, raw_df).to_parquet(filename)
+        return
+
+    if filename.is_file():
+        old_df = pd.read_parquet(filename)
+        if "recipe_id" in old_df.columns:
+            affected = old_df["recipe_id"].isin(affected_recipe_ids(changeset_df))
+        else:
+            affected = pd.Series(True, index=old_df.index)
+        removed = chunk_ids(old_df[affected])
+        old_df = old_df[~affected]
+    else:
+        old_df, removed = None, chunk_ids(pd.DataFrame())
+
+    new_df = build_chunks(
+        builder, raw_df[raw_df["link"].isin(updated_links(changeset_df))]
+    )
+    if new_df.shape[0] > 0:
+        id_column = "chunk_id" if "chunk_id" in new_df.columns else "id"
+        used = chunk_ids(old_df) if old_df is not None else chunk_ids(pd.DataFrame())
+        new_df[id_column] = allocate_chunk_ids(used, new_df.shape[0])
+    write_chunk_delta(filename, added=chunk_ids(new_df), removed=removed)
+
+    pd.concat([old_df, new_df], ignore_index=True).to_parquet(filename)
 
 
-def main() -> None:
-    args = parse_args()
-    raw_df = pd.read_csv(args.raw_filename, sep=args.separator)
+def save_store_chunks(
+    builder: Callable[..., pd.DataFrame],
+    table: pa.Table,
+    filename: Path,
+    batch_rows: int,
+    lists_as_text: bool,
+) -> None:
+    chunk_offset, writer = 0, None
+    for raw_df in recipe_frames(table, batch_rows, lists_as_text):
+        chunk_df = build_chunks(builder, raw_df, chunk_offset=chunk_offset)
+        if chunk_df.shape[0] == 0:
+            continue
+        chunk_offset = int(chunk_ids(chunk_df).max()) + 1
+
+        chunk_table = pa.Table.from_pandas(chunk_df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(filename, chunk_table.schema)
+        writer.write_table(chunk_table.cast(writer.schema))
+
+    if writer is not None:
+        writer.close()
+
+
+def chunk_store(args: Namespace) -> None:
+    table = open_store(args.store_file)
 
     save_folder = Path(args.chunks_folder)
     save_folder.mkdir(parents=True, exist_ok=True)
 
-    all_kinds_chunks(raw_df, save_folder)
-    recipe_and_ingredients_chunks(raw_df, save_folder)
+    builders = {
+        "all_kinds": (all_kinds_chunks, True),
+        "recipe_and_ingredients": (recipe_and_ingredients_chunks, True),
+        "full_recipe": (full_recipe_chunks, False),
+    }
+    for strategy in args.strategies:
+        builder, lists_as_text = builders[strategy]
+        with stage(f"{strategy}_chunks") as stats:
+            save_store_chunks(
+                builder,
+                table,
+                save_folder / f"{strategy}_chunks.parquet",
+                args.batch_rows,
+                lists_as_text,
+            )
+            stats.add(items=table.num_rows)
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        if args.store_file is not None:
+            chunk_store(args)
+            return
 
-    raw_df["ingredients"] = raw_df["ingredients"].apply(safe_eval)
-    raw_df["recipe"] = raw_df["recipe"].apply(safe_eval)
+        with stage("read_csv") as stats:
+            raw_df = pd.read_csv(args.raw_filename, sep=args.separator)
+            stats.add(
+                items=raw_df.shape[0], bytes=Path(args.raw_filename).stat().st_size
+            )
+
+        save_folder = Path(args.chunks_folder)
+        save_folder.mkdir(parents=True, exist_ok=True)
+
+        if args.canonical_only:
+            raw_df = raw_df[raw_df["is_canonical"]]
+
+        changeset_df = (
+            read_changeset(args.delta_file) if args.delta_file is not None else None
+        )
 
-    full_recipe_chunks(raw_df, save_folder)
+        if "all_kinds" in args.strategies:
+            with stage("all_kinds_chunks") as stats:
+                save_chunks(
+                    all_kinds_chunks,
+                    raw_df,
+                    save_folder / "all_kinds_chunks.parquet",
+                    changeset_df,
+                )
+                stats.add(items=raw_df.shape[0])
+
+        if "recipe_and_ingredients" in args.strategies:
+            with stage("recipe_and_ingredients_chunks") as stats:
+                save_chunks(
+                    recipe_and_ingredients_chunks,
+                    raw_df,
+                    save_folder / "recipe_and_ingredients_chunks.parquet",
+                    changeset_df,
+                )
+                stats.add(items=raw_df.shape[0])
+
+        if "full_recipe" in args.strategies:
+            with stage("safe_eval") as stats:
+                raw_df["ingredients"] = raw_df["ingredients"].apply(safe_eval)
+                raw_df["recipe"] = raw_df["recipe"].apply(safe_eval)
+                stats.add(items=raw_df.shape[0])
+
+            with stage("full_recipe_chunks") as stats:
+                save_chunks(
+                    full_recipe_chunks,
+                    raw_df,
+                    save_folder / "full_recipe_chunks.parquet",
+                    changeset_df,
+                )
+                stats.add(items=raw_df.shape[0])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import re
+import zlib
+from argparse import ArgumentParser, Namespace
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from utils.profiler import add_profiler_args, profile_run, stage
+from utils.safe_eval import safe_eval
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "--clean-filename", type=str, default="data/recipes_texts_clean.csv"
+    )
+    parser.add_argument(
+        "--dedup-filename", type=str, default="data/recipes_texts_dedup.csv"
+    )
+    parser.add_argument("--separator", type=str, default=",")
+    parser.add_argument("--shingle-size", type=int, default=3)
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=32)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=42)
+    add_profiler_args(parser)
+
+    return parser.parse_args()
+
+
+def recipe_text(ingredients: object, recipe: object) -> str:
+    return " ".join(safe_eval(ingredients) + safe_eval(recipe))
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def shingles(text: str, size: int) -> np.ndarray:
+    tokens = tokenize(text)
+    return np.array(
+        [
+            zlib.crc32(" ".join(tokens[i : i + size]).encode())
+            for i in range(len(tokens) - size + 1)
+        ],
+        dtype=np.uint64,
+    )
+
+
+def minhash_signatures(
+    texts: list[str], shingle_size: int, a: np.ndarray, b: np.ndarray
+) -> np.ndarray:
+    signatures = np.empty((len(texts), a.shape[0]), dtype=np.uint32)
+    for text_idx, text in enumerate(texts):
+        hashed = shingles(text, shingle_size)
+        if hashed.shape[0] == 0:
+            signatures[text_idx] = MAX_HASH
+            continue
+        phv = ((np.outer(hashed, a) + b) % MERSENNE_PRIME) & MAX_HASH
+        signatures[text_idx] = phv.min(axis=0)
+    return signatures
+
+
+def _minhash_worker(task: tuple[list[str], int, np.ndarray, np.ndarray]) -> np.ndarray:
+    return minhash_signatures(*task)
+
+
+def permutations(num_perm: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def find(parents: np.ndarray, idx: int) -> int:
+    root = idx
+    while parents[root] != root:
+        root = parents[root]
+    while parents[idx] != root:
+        parents[idx], idx = root, parents[idx]
+    return root
+
+
+def lsh_clusters(
+    signatures: np.ndarray,
+    bands: int,
+    threshold: float,
+    valid: np.ndarray | None = None,
+) -> np.ndarray:
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    parents = np.arange(n)
+    candidates = np.flatnonzero(valid) if valid is not None else np.arange(n)
+
+    for band in range(bands):
+        band_sig = np.ascontiguousarray(
+            signatures[candidates, band * rows : (band + 1) * rows]
+        )
+        _, buckets = np.unique(
+            band_sig.view(np.dtype((np.void, band_sig.dtype.itemsize * rows))),
+            return_inverse=True,
+        )
+        buckets = buckets.ravel()
+
+        order = np.argsort(buckets, kind="stable")
+        starts = np.flatnonzero(np.diff(buckets[order], prepend=-1))
+        sizes = np.diff(np.append(starts, candidates.shape[0]))
+
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            members = candidates[order[start : start + size]]
+            member_sigs = signatures[members]
+            for idx, head in enumerate(members[:-1]):
+                similarity = (member_sigs[idx + 1 :] == member_sigs[idx]).mean(axis=1)
+                for member in members[idx + 1 :][similarity >= threshold]:
+                    root_head, root_member = find(parents, head), find(parents, member)
+                    if root_head != root_member:
+                        parents[max(root_head, root_member)] = min(
+                            root_head, root_member
+                        )
+
+    return np.array([find(parents, idx) for idx in range(n)])
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        clean_df = pd.read_csv(args.clean_filename, sep=args.separator)
+        if "recipe_id" not in clean_df.columns:
+            clean_df["recipe_id"] = np.arange(clean_df.shape[0])
+
+        texts = [
+            recipe_text(ingredients, recipe)
+            for ingredients, recipe in zip(clean_df["ingredients"], clean_df["recipe"])
+        ]
+        a, b = permutations(args.num_perm, args.seed)
+
+        with stage("minhash") as stats:
+            tasks = [
+                (texts[i : i + args.chunk_size], args.shingle_size, a, b)
+                for i in range(0, len(texts), args.chunk_size)
+            ]
+            with Pool(processes=args.workers) as pool:
+                signatures = [np.empty((0, args.num_perm), dtype=np.uint32)]
+                signatures += tqdm(pool.imap(_minhash_worker, tasks), total=len(tasks))
+                signatures = np.concatenate(signatures)
+            stats.add(items=len(texts), bytes=sum(len(t.encode()) for t in texts))
+
+        with stage("lsh") as stats:
+            valid = np.array([len(tokenize(t)) >= args.shingle_size for t in texts])
+            roots = lsh_clusters(signatures, args.bands, args.threshold, valid)
+            stats.add(items=len(texts))
+
+        lengths = pd.Series([len(t) for t in texts])
+        canonical = (
+            pd.DataFrame({"root": roots, "length": lengths})
+            .sort_values(["root", "length"], ascending=[True, False], kind="stable")
+            .drop_duplicates("root")
+        )
+        canonical_ids = clean_df["recipe_id"].to_numpy()[canonical.index.to_numpy()]
+        root_to_cluster = dict(zip(canonical["root"], canonical_ids))
+
+        clean_df["cluster_id"] = [root_to_cluster[root] for root in roots]
+        clean_df["is_canonical"] = clean_df["cluster_id"] == clean_df["recipe_id"]
+        clean_df.to_csv(args.dedup_filename, index=False)
+
+        duplicates = clean_df.shape[0] - clean_df["is_canonical"].sum()
+        print(
+            f"{clean_df.shape[0]} recipes, "
+            f"{clean_df['cluster_id'].nunique()} clusters, {duplicates} duplicates"
+        )
+
+
+if __name__ == "__main__":
+    main()
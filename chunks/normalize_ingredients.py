@@ -0,0 +1,84 @@
+from argparse import ArgumentParser, Namespace
+
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from utils.ingredients import IngredientIndex, name_keys, parse_ingredient
+from utils.profiler import add_profiler_args, profile_run, stage
+from utils.safe_eval import safe_eval
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "--clean-filename", type=str, default="data/recipes_texts_clean.csv"
+    )
+    parser.add_argument(
+        "--ingredients-filename", type=str, default="data/recipes_ingredients.parquet"
+    )
+    parser.add_argument(
+        "--index-filename", type=str, default="data/ingredient_index.npz"
+    )
+    parser.add_argument("--separator", type=str, default=",")
+    add_profiler_args(parser)
+
+    return parser.parse_args()
+
+
+def normalize_recipe(ingredients: list[str]) -> dict[str, list]:
+    recipe = {"names": [], "quantities": [], "units": [], "ingredient_keys": []}
+    for ingredient in ingredients:
+        name, quantity, unit = parse_ingredient(ingredient)
+        if not name:
+            continue
+        recipe["names"].append(name)
+        recipe["quantities"].append(quantity)
+        recipe["units"].append(unit)
+        for key in name_keys(name):
+            if key not in recipe["ingredient_keys"]:
+                recipe["ingredient_keys"].append(key)
+    return recipe
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        with stage("read_csv") as stats:
+            clean_df = pd.read_csv(args.clean_filename, sep=args.separator)
+            stats.add(items=clean_df.shape[0])
+        if "recipe_id" not in clean_df.columns:
+            clean_df["recipe_id"] = np.arange(clean_df.shape[0])
+
+        with stage("normalize_ingredients") as stats:
+            rows = []
+            for recipe_id, ingredients in zip(
+                clean_df["recipe_id"], tqdm(clean_df["ingredients"])
+            ):
+                rows.append(
+                    {"recipe_id": recipe_id, **normalize_recipe(safe_eval(ingredients))}
+                )
+            ingredients_df = pd.DataFrame(rows)
+            stats.add(items=ingredients_df.shape[0])
+
+        with stage("build_index") as stats:
+            index = IngredientIndex.build(
+                dict(
+                    zip(ingredients_df["recipe_id"], ingredients_df["ingredient_keys"])
+                )
+            )
+            stats.add(items=len(index.keys))
+
+        ingredients_df.to_parquet(args.ingredients_filename, index=False)
+        index.save(args.index_filename)
+
+        print(
+            f"{ingredients_df.shape[0]} recipes, {len(index.keys)} ingredient keys, "
+            f"{len(index.recipe_ids)} postings"
+        )
+
+
+if __name__ == "__main__":
+    main()
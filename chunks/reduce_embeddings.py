@@ -0,0 +1,80 @@
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from utils.profiler import add_profiler_args, profile_run, stage
+from utils.reduction import (
+    fit_pca,
+    open_embeddings,
+    project,
+    save_projection,
+    truncation,
+)
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--mmap-file", type=str, default="data/embeddings.mmap")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--target-dim", type=int, default=256)
+    parser.add_argument(
+        "--method", type=str, choices=["pca", "truncate"], default="pca"
+    )
+    parser.add_argument("--block-size", type=int, default=8192)
+    parser.add_argument("--reduced-mmap-file", type=str, default=None)
+    parser.add_argument("--projection-file", type=str, default=None)
+    add_profiler_args(parser)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    mmap_file = Path(args.mmap_file)
+    suffix = f"{args.method}{args.target_dim}"
+    reduced_mmap_file = args.reduced_mmap_file or str(
+        mmap_file.with_name(f"{mmap_file.stem}_{suffix}.mmap")
+    )
+    projection_file = args.projection_file or str(
+        mmap_file.with_name(f"{mmap_file.stem}_{suffix}.npz")
+    )
+
+    with profile_run(args):
+        embeddings = open_embeddings(mmap_file, args.embedding_dim)
+
+        with stage("fit_projection") as stats:
+            if args.method == "pca":
+                mean, components = fit_pca(embeddings, args.target_dim, args.block_size)
+            else:
+                mean, components = truncation(args.embedding_dim, args.target_dim)
+            stats.add(items=embeddings.shape[0], bytes=embeddings.nbytes)
+        save_projection(projection_file, mean, components)
+
+        reduced = np.memmap(
+            filename=reduced_mmap_file,
+            dtype=np.float32,
+            shape=(embeddings.shape[0], args.target_dim),
+            mode="w+",
+        )
+        with stage("project") as stats:
+            for start in tqdm(range(0, embeddings.shape[0], args.block_size)):
+                block = embeddings[start : start + args.block_size]
+                reduced[start : start + block.shape[0]] = project(
+                    block, mean, components
+                )
+            reduced.flush()
+            stats.add(items=embeddings.shape[0], bytes=reduced.nbytes)
+
+        print(
+            f"{embeddings.shape[0]} vectors reduced {args.embedding_dim} -> "
+            f"{args.target_dim} ({args.method}): {reduced_mmap_file}, "
+            f"{projection_file}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
+import time
 from argparse import ArgumentParser, Namespace
-from copy import deepcopy
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import numpy as np
 import pandas as pd
 import requests
 from tqdm.auto import tqdm
 
+from utils.adaptive_batch import AdaptiveBatcher
+from utils.delta import (
+    chunk_ids,
+    open_growing_mmap,
+    read_chunk_delta,
+    read_dropped_ids,
+    save_chunk_delta,
+    write_dropped_ids,
+)
+from utils.profiler import add_profiler_args, profile_run, stage
+
 
 def parse_args() -> Namespace:
     parser = ArgumentParser()
@@ -19,7 +32,18 @@ def parse_args() -> Namespace:
     parser.add_argument("--vectorize-column", type=str, default="chunk")
     parser.add_argument("--mmap-file", type=str, default="data/embeddings.mmap")
     parser.add_argument("--batch-size", type=int, default=64)
-    parser.add_argument("--embedding-dim", type=str, default=1024)
+    parser.add_argument("--min-batch-size", type=int, default=1)
+    parser.add_argument("--max-batch-size", type=int, default=512)
+    parser.add_argument("--fixed-batch-size", action="store_true")
+    parser.add_argument("--max-batch-bytes", type=int, default=1 << 20)
+    parser.add_argument("--max-inflight-bytes", type=int, default=4 << 20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--flush-every", type=int, default=16)
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--delta-file", type=str, default=None)
+    add_profiler_args(parser)
 
     return parser.parse_args()
 
@@ -27,39 +51,149 @@ def parse_args() -> Namespace:
 def main() -> None:
     args = parse_args()
 
+    with profile_run(args):
+        vectorize(args)
+
+
+def vectorize(args: Namespace) -> None:
     chunk_df = pd.read_parquet(args.chunks_file)
     chunks = chunk_df[args.vectorize_column].to_list()
-
-    mmap = np.memmap(
-        filename=args.mmap_file,
-        dtype=np.float32,
-        shape=(chunk_df.shape[0], args.embedding_dim),
-        mode="w+",
+    ids = chunk_ids(chunk_df)
+    mmap_rows = int(ids.max(initial=-1)) + 1
+
+    if args.delta_file is not None:
+        added, removed = read_chunk_delta(args.delta_file)
+        retried = read_dropped_ids(args.mmap_file).difference(added)
+        rows = np.flatnonzero(np.isin(ids, list(added | retried)))
+        mmap = open_growing_mmap(args.mmap_file, mmap_rows, args.embedding_dim)
+    else:
+        rows = np.arange(chunk_df.shape[0])
+        mmap = np.memmap(
+            filename=args.mmap_file,
+            dtype=np.float32,
+            shape=(mmap_rows, args.embedding_dim),
+            mode="w+",
+        )
+    dropped = set()
+    print(f"{mmap.shape = }, {rows.shape[0]} chunks to vectorize")
+
+    batcher = AdaptiveBatcher(
+        batch_size=args.batch_size,
+        min_size=args.min_batch_size,
+        max_size=args.max_batch_size,
+        max_bytes=args.max_batch_bytes,
+    )
+    sizes = [len(chunks[row].encode()) for row in rows]
+    session = requests.Session()
+
+    position, inflight_bytes, written = 0, 0, 0
+    retry_queue: deque[tuple[int, int, int]] = deque()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, tqdm(
+        total=rows.shape[0]
+    ) as progress:
+        while position < rows.shape[0] or retry_queue or running:
+            while len(running) < args.workers:
+                if retry_queue:
+                    start, count, attempt = retry_queue[0]
+                elif position < rows.shape[0]:
+                    start, count, attempt = position, batcher.take(sizes, position), 0
+                else:
+                    break
+
+                batch_bytes = sum(sizes[start : start + count])
+                if running and inflight_bytes + batch_bytes > args.max_inflight_bytes:
+                    break
+                if attempt:
+                    retry_queue.popleft()
+                else:
+                    position += count
+
+                texts = [chunks[row] for row in rows[start : start + count]]
+                future = executor.submit(embed_batch, session, args, texts, attempt)
+                running[future] = (start, count, attempt, batch_bytes)
+                inflight_bytes += batch_bytes
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                start, count, attempt, batch_bytes = running.pop(future)
+                inflight_bytes -= batch_bytes
+                embeddings, elapsed = future.result()
+
+                if embeddings is None:
+                    if not args.fixed_batch_size:
+                        batcher.failure(count)
+                    if attempt >= args.max_retries:
+                        dropped.update(ids[rows[start : start + count]].tolist())
+                        progress.update(count)
+                    elif count > 1:
+                        half = count // 2
+                        retry_queue.appendleft(
+                            (start + half, count - half, attempt + 1)
+                        )
+                        retry_queue.appendleft((start, half, attempt + 1))
+                    else:
+                        retry_queue.appendleft((start, count, attempt + 1))
+                    continue
+
+                if not args.fixed_batch_size:
+                    batcher.success(count, elapsed, batch_bytes)
+
+                with stage("write_mmap") as stats:
+                    batch_rows = rows[start : start + count]
+                    mmap[ids[batch_rows]] = np.array(embeddings, dtype=np.float32)
+                    stats.add(items=count)
+                written += 1
+                if written % args.flush_every == 0:
+                    mmap.flush()
+
+                progress.update(count)
+                progress.set_postfix(batch_size=batcher.batch_size)
+
+    mmap.flush()
+    write_dropped_ids(args.mmap_file, dropped)
+    if args.delta_file is not None:
+        recovered = retried.intersection(ids.tolist()).difference(dropped)
+        if recovered:
+            save_chunk_delta(
+                args.delta_file, sorted(added | recovered), sorted(removed)
+            )
+    print(
+        f"operating point: {batcher.operating_point()}, "
+        f"{len(dropped)} chunks dropped"
     )
-    print(f"{mmap.shape = }")
 
-    request_json_pattern = {
+
+def embed_batch(
+    session: requests.Session, args: Namespace, texts: list[str], attempt: int
+) -> tuple[list[list[float]] | None, float]:
+    request_json = {
         "model": args.model,
-        "input": None,
+        "input": texts,
         "options": {"num_ctx": args.num_ctx},
     }
-    print(f"{request_json_pattern = }")
-
-    for batch_start in tqdm(range(0, chunk_df.shape[0], args.batch_size)):
-        batch_end = min(batch_start + args.batch_size, chunk_df.shape[0])
-
-        request_json = deepcopy(request_json_pattern)
-        request_json["input"] = chunks[batch_start:batch_end]
-
-        response = requests.post(url=args.api_url, json=request_json, timeout=120)
-
-        if response.status_code == 200:
-            response_json = response.json()
-
-            for emb_idx, emb in enumerate(response_json["embeddings"]):
-                mmap[batch_start + emb_idx, :] = np.array(emb).astype(np.float32)
 
-            mmap.flush()
+    with stage("embed") as stats:
+        stats.add(
+            items=len(texts),
+            bytes=sum(len(t.encode()) for t in texts),
+            retries=int(attempt > 0),
+        )
+        start = time.perf_counter()
+        try:
+            response = session.post(
+                url=args.api_url, json=request_json, timeout=args.timeout
+            )
+        except requests.RequestException:
+            stats.add(errors=1)
+            return None, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+
+        if response.status_code != 200:
+            stats.add(errors=1)
+            return None, elapsed
+        return response.json()["embeddings"], elapsed
 
 
 if __name__ == "__main__":
@@ -10,6 +10,8 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from tqdm.auto import tqdm
 
+from utils.profiler import add_profiler_args, profile_run, stage
+
 load_dotenv()
 
 
@@ -17,22 +19,32 @@ def get_page_content(fid: int, page: int, agents: list[str]) -> str | None:
     url = f"https://www.russianfood.com/recipes/bytype/?fid={fid}&page={page}#rcp_list"
     headers = {"User-Agent": random.choice(agents)}
 
-    response = requests.get(
-        url="https://proxy.scrapeops.io/v1/",
-        params={
-            "api_key": os.getenv("SCRAPEOPS_API_KEY"),
-            "url": url,
-        },
-        headers=headers,
-        timeout=120,
-    )
+    with stage("get_page_content") as stats:
+        response = requests.get(
+            url="https://proxy.scrapeops.io/v1/",
+            params={
+                "api_key": os.getenv("SCRAPEOPS_API_KEY"),
+                "url": url,
+            },
+            headers=headers,
+            timeout=120,
+        )
+        stats.add(items=1, bytes=len(response.content))
 
-    if response.status_code == 200:
-        return response.text
-    return None
+        if response.status_code == 200:
+            return response.text
+        stats.add(errors=1)
+        return None
 
 
 def extract_recipes(html_content: str) -> list[list[str]] | None:
+    with stage("extract_recipes") as stats:
+        outputs = _extract_recipes(html_content)
+        stats.add(items=len(outputs) if outputs else 0, bytes=len(html_content or ""))
+        return outputs
+
+
+def _extract_recipes(html_content: str) -> list[list[str]] | None:
     if not html_content:
         return None
 
@@ -91,6 +103,7 @@ def parse_args() -> Namespace:
     parser.add_argument("--start-page", type=int, default=1)
     parser.add_argument("--save-fid", type=str, default=None)
     parser.add_argument("--fid-file", type=str, default=None)
+    add_profiler_args(parser)
 
     return parser.parse_args()
 
@@ -98,6 +111,11 @@ def parse_args() -> Namespace:
 def main():
     args = parse_args()
 
+    with profile_run(args):
+        crawl(args)
+
+
+def crawl(args: Namespace) -> None:
     filename = Path(args.filename)
     file_exist = filename.is_file()
     filename.parent.mkdir(parents=True, exist_ok=True)
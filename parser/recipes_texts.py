@@ -10,28 +10,39 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from tqdm.auto import tqdm
 
+from utils.profiler import add_profiler_args, profile_run, stage
+
 load_dotenv()
 
 
 def get_page_content(url: str, agents: list[str]) -> str | None:
     headers = {"User-Agent": random.choice(agents)}
 
-    response = requests.get(
-        url="https://proxy.scrapeops.io/v1/",
-        params={
-            "api_key": os.getenv("SCRAPEOPS_API_KEY"),
-            "url": url,
-        },
-        headers=headers,
-        timeout=120,
-    )
+    with stage("get_page_content") as stats:
+        response = requests.get(
+            url="https://proxy.scrapeops.io/v1/",
+            params={
+                "api_key": os.getenv("SCRAPEOPS_API_KEY"),
+                "url": url,
+            },
+            headers=headers,
+            timeout=120,
+        )
+        stats.add(items=1, bytes=len(response.content))
 
-    if response.status_code == 200:
-        return response.text
-    return None
+        if response.status_code == 200:
+            return response.text
+        stats.add(errors=1)
+        return None
 
 
 def extract_recipe(html_content: str) -> tuple[str, str, str, list[str], list[str]]:
+    with stage("extract_recipe") as stats:
+        stats.add(items=1, bytes=len(html_content or ""))
+        return _extract_recipe(html_content)
+
+
+def _extract_recipe(html_content: str) -> tuple[str, str, str, list[str], list[str]]:
     if not html_content:
         return None, None, None, [], []
 
@@ -107,6 +118,7 @@ def parse_args() -> Namespace:
     parser.add_argument("--agents", type=str, default="data/agents.json")
     parser.add_argument("--total", type=int, default=-1)
     parser.add_argument("--skip-first-n", type=int, default=-1)
+    add_profiler_args(parser)
 
     return parser.parse_args()
 
@@ -114,6 +126,11 @@ def parse_args() -> Namespace:
 def main():
     args = parse_args()
 
+    with profile_run(args):
+        parse_texts(args)
+
+
+def parse_texts(args: Namespace) -> None:
     read_filename = Path(args.recipes_pages_filename)
     write_filename = Path(args.recipes_texts_filename)
 
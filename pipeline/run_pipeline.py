@@ -0,0 +1,406 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+
+from utils.hashing import FileHashCache, text_hash
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STRATEGY_COLUMNS = {
+    "full_recipe": "chunk",
+    "recipe_and_ingredients": "chunk_text",
+    "all_kinds": "chunk_text",
+}
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    args: list[str]
+    inputs: list[str]
+    outputs: list[str] = field(default_factory=list)
+    external: bool = False
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--data-folder", type=str, default="data")
+    parser.add_argument("--state-file", type=str, default="data/pipeline_state.json")
+    parser.add_argument(
+        "--strategies",
+        type=str,
+        nargs="+",
+        choices=list(STRATEGY_COLUMNS),
+        default=list(STRATEGY_COLUMNS),
+    )
+    parser.add_argument("--targets", type=str, nargs="+", default=None)
+    parser.add_argument("--upload", action="store_true")
+    parser.add_argument("--collection-prefix", type=str, default="chefrag")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--force", type=str, nargs="*", default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--metrics-file", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def build_stages(args: Namespace) -> list[Stage]:
+    data = Path(args.data_folder)
+    pages = str(data / "recipes_pages.csv")
+    pages_clean = str(data / "recipes_pages_clean.csv")
+    texts = str(data / "recipes_texts.csv")
+    texts_clean = str(data / "recipes_texts_clean.csv")
+    agents = str(data / "agents.json")
+    stop_chars = str(data / "stop_chars.json")
+    ingredients = str(data / "recipes_ingredients.parquet")
+    ingredient_index = str(data / "ingredient_index.npz")
+    title_index = str(data / "title_index.npz")
+
+    stages = [
+        Stage(
+            name="recipes_pages",
+            script="parser/recipes_pages.py",
+            args=["--filename", pages, "--agents", agents],
+            inputs=[agents],
+            outputs=[pages],
+            external=True,
+        ),
+        Stage(
+            name="unique_recipes",
+            script="parser/unique_recipes.py",
+            args=["--filename", pages, "--save-filename", pages_clean],
+            inputs=[pages],
+            outputs=[pages_clean],
+        ),
+        Stage(
+            name="recipes_texts",
+            script="parser/recipes_texts.py",
+            args=[
+                "--recipes-pages-filename",
+                pages_clean,
+                "--recipes-texts-filename",
+                texts,
+                "--agents",
+                agents,
+            ],
+            inputs=[pages_clean, agents],
+            outputs=[texts],
+            external=True,
+        ),
+        Stage(
+            name="clean_texts",
+            script="chunks/clean_texts.py",
+            args=[
+                "--raw-filename",
+                texts,
+                "--clean-filename",
+                texts_clean,
+                "--stop-chars-filename",
+                stop_chars,
+            ],
+            inputs=[texts, stop_chars],
+            outputs=[texts_clean],
+        ),
+        Stage(
+            name="normalize_ingredients",
+            script="chunks/normalize_ingredients.py",
+            args=[
+                "--clean-filename",
+                texts_clean,
+                "--ingredients-filename",
+                ingredients,
+                "--index-filename",
+                ingredient_index,
+            ],
+            inputs=[texts_clean],
+            outputs=[ingredients, ingredient_index],
+        ),
+        Stage(
+            name="build_title_index",
+            script="chunks/build_title_index.py",
+            args=[
+                "--pages-filename",
+                pages_clean,
+                "--clean-filename",
+                texts_clean,
+                "--index-filename",
+                title_index,
+            ],
+            inputs=[pages_clean, texts_clean],
+            outputs=[title_index],
+        ),
+    ]
+
+    for strategy in args.strategies:
+        chunks = str(data / f"{strategy}_chunks.parquet")
+        embeddings = str(data / f"{strategy}_embeddings.mmap")
+
+        stages.append(
+            Stage(
+                name=f"create_chunks_{strategy}",
+                script="chunks/create_chunks.py",
+                args=[
+                    "--raw-filename",
+                    texts_clean,
+                    "--chunks-folder",
+                    str(data),
+                    "--strategies",
+                    strategy,
+                ],
+                inputs=[texts_clean],
+                outputs=[chunks],
+            )
+        )
+        stages.append(
+            Stage(
+                name=f"vectorize_chunks_{strategy}",
+                script="chunks/vectorize_chunks.py",
+                args=[
+                    "--chunks-file",
+                    chunks,
+                    "--vectorize-column",
+                    STRATEGY_COLUMNS[strategy],
+                    "--mmap-file",
+                    embeddings,
+                    "--embedding-dim",
+                    str(args.embedding_dim),
+                ],
+                inputs=[chunks],
+                outputs=[embeddings],
+            )
+        )
+        if args.upload:
+            stages.append(
+                Stage(
+                    name=f"upload_{strategy}",
+                    script="qdrant/upload.py",
+                    args=[
+                        "--collection-name",
+                        f"{args.collection_prefix}-{strategy}",
+                        "--chunks-file",
+                        chunks,
+                        "--chunks-mmap",
+                        embeddings,
+                        "--embedding-dim",
+                        str(args.embedding_dim),
+                        "--ingredients-file",
+                        ingredients,
+                    ],
+                    inputs=[chunks, embeddings, ingredients],
+                )
+            )
+
+    return stages
+
+
+def dependencies(stages: list[Stage]) -> dict[str, set[str]]:
+    producers = {output: s.name for s in stages for output in s.outputs}
+    return {s.name: {producers[i] for i in s.inputs if i in producers} for s in stages}
+
+
+def select_stages(
+    stages: list[Stage], deps: dict[str, set[str]], targets: list[str] | None
+) -> list[Stage]:
+    if targets is None:
+        return stages
+
+    selected = set()
+    queue = list(targets)
+    while queue:
+        name = queue.pop()
+        if name not in deps:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in selected:
+            selected.add(name)
+            queue.extend(deps[name])
+    return [s for s in stages if s.name in selected]
+
+
+def load_state(filename: Path) -> dict:
+    if filename.is_file():
+        with open(filename) as f:
+            return json.load(f)
+    return {"files": {}, "stages": {}}
+
+
+def save_state(filename: Path, state: dict) -> None:
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    tmp_filename = filename.with_suffix(".tmp")
+    with open(tmp_filename, "w") as f:
+        json.dump(state, f, indent=4)
+    tmp_filename.replace(filename)
+
+
+def module_file(name: str, folders: list[Path]) -> Path | None:
+    for folder in folders:
+        path = folder.joinpath(*name.split("."))
+        for candidate in (path.with_suffix(".py"), path / "__init__.py"):
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def imported_modules(filename: Path) -> list[tuple[str, list[Path]]]:
+    tree = ast.parse(filename.read_text(), filename=str(filename))
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules += [(a.name, [filename.parent, ROOT]) for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            folders = [filename.parents[node.level - 1]] if node.level else None
+            folders = folders or [filename.parent, ROOT]
+            base = node.module or ""
+            modules.append((base, folders))
+            modules += [(f"{base}.{a.name}".strip("."), folders) for a in node.names]
+    return modules
+
+
+@cache
+def code_files(script: Path) -> tuple[Path, ...]:
+    files, queue = {script}, [script]
+    while queue:
+        for name, folders in imported_modules(queue.pop()):
+            parts = name.split(".") if name else []
+            for i in range(1, len(parts) + 1):
+                path = module_file(".".join(parts[:i]), folders)
+                if path is not None and path.is_relative_to(ROOT) and path not in files:
+                    files.add(path)
+                    queue.append(path)
+    return tuple(sorted(files))
+
+
+def stage_signature(stage: Stage, cache: FileHashCache) -> str | None:
+    input_hashes = [cache.hash(i) for i in stage.inputs]
+    if any(h is None for h in input_hashes):
+        return None
+
+    code = code_files(ROOT / stage.script) if (ROOT / stage.script).is_file() else ()
+    code_hashes = [f"{f.relative_to(ROOT)}:{cache.hash(f)}" for f in code]
+    return text_hash(*code_hashes, *stage.args, *stage.inputs, *input_hashes)
+
+
+def is_up_to_date(
+    stage: Stage, signature: str, state: dict, cache: FileHashCache
+) -> bool:
+    if stage.external:
+        return all(Path(o).is_file() for o in stage.outputs)
+
+    record = state["stages"].get(stage.name)
+    if record is None or record["signature"] != signature:
+        return False
+    return all(cache.hash(o) == record["outputs"].get(o) for o in stage.outputs)
+
+
+def run_stage(stage: Stage, metrics_file: str | None) -> tuple[int, float]:
+    command = [sys.executable, str(ROOT / stage.script), *stage.args]
+    if metrics_file is not None:
+        command += ["--metrics-file", metrics_file]
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(ROOT), env.get("PYTHONPATH")) if p
+    )
+
+    start = time.perf_counter()
+    completed = subprocess.run(command, env=env, cwd=os.getcwd())
+    return completed.returncode, time.perf_counter() - start
+
+
+def main() -> None:
+    args = parse_args()
+
+    stages = build_stages(args)
+    deps = dependencies(stages)
+    stages = select_stages(stages, deps, args.targets)
+    forced = set(s.name for s in stages) if args.force == [] else set(args.force or [])
+
+    state_file = Path(args.state_file)
+    state = load_state(state_file)
+    cache = FileHashCache(state["files"])
+
+    pending = {s.name: s for s in stages}
+    selected = set(pending)
+    done, failed, stale = set(), set(), set()
+    running: dict[Future, tuple[Stage, str]] = {}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                stage_deps = deps[name] & selected
+                if stage_deps & failed:
+                    print(f"[skip] {name}: dependency failed")
+                    failed.add(name)
+                    del pending[name]
+                    continue
+                if not stage_deps <= done:
+                    continue
+
+                del pending[name]
+                if args.dry_run and stage_deps & stale and not stage.external:
+                    print(f"[stale] {name}")
+                    stale.add(name)
+                    done.add(name)
+                    continue
+
+                signature = stage_signature(stage, cache)
+                if signature is None and not stage.external:
+                    print(f"[fail] {name}: missing inputs")
+                    failed.add(name)
+                    continue
+
+                if name not in forced and is_up_to_date(stage, signature, state, cache):
+                    print(f"[fresh] {name}")
+                    done.add(name)
+                    continue
+
+                if args.dry_run:
+                    print(f"[stale] {name}")
+                    stale.add(name)
+                    done.add(name)
+                    continue
+
+                print(f"[run] {name}")
+                future = executor.submit(run_stage, stage, args.metrics_file)
+                running[future] = (stage, signature)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, signature = running.pop(future)
+                returncode, elapsed = future.result()
+
+                if returncode != 0:
+                    print(f"[fail] {stage.name}: exit code {returncode}")
+                    failed.add(stage.name)
+                    continue
+
+                print(f"[done] {stage.name} in {elapsed:.1f}s")
+                done.add(stage.name)
+                state["stages"][stage.name] = {
+                    "signature": signature or stage_signature(stage, cache),
+                    "outputs": {o: cache.hash(o) for o in stage.outputs},
+                }
+                save_state(state_file, state)
+
+    save_state(state_file, state)
+    print(f"{cache.hashed} files hashed")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
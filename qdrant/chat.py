@@ -0,0 +1,254 @@
+import json
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from collections import Counter
+from dataclasses import dataclass, field
+
+import requests
+from qdrant_client import QdrantClient
+
+from qdrant.search import embed_queries, fetch_recipes, search_recipes
+from utils.doc_store import DocStore
+from utils.intent import TitleIndex, classify_intent
+from utils.prompt import PrefixCacheStats, build_messages, render_messages
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument("--query", type=str, default=None)
+    parser.add_argument("--questions-file", type=str, default=None)
+    parser.add_argument("--qdrant-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument(
+        "--qdrant-collection-name",
+        type=str,
+        default="chefrag-ollama-bge-m3-567m-fp16",
+    )
+    parser.add_argument(
+        "--ollama-api-url", type=str, default="http://localhost:11434/api/embed"
+    )
+    parser.add_argument("--ollama-model", type=str, default="bge-m3:567m-fp16")
+    parser.add_argument("--num-ctx", type=int, default=8192)
+    parser.add_argument("--topk", type=int, default=4)
+    parser.add_argument(
+        "--llm-backend", type=str, choices=["ollama", "openai"], default="ollama"
+    )
+    parser.add_argument(
+        "--llm-api-url", type=str, default="http://localhost:11434/api/chat"
+    )
+    parser.add_argument(
+        "--llm-model",
+        type=str,
+        default="hf.co/bartowski/Qwen2.5-3B-Instruct-GGUF:Q4_K_M",
+    )
+    parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--keep-alive", type=str, default="30m")
+    parser.add_argument("--stats-file", type=str, default=None)
+    parser.add_argument("--doc-store", type=str, default=None)
+    parser.add_argument("--route-intents", action="store_true")
+    parser.add_argument("--title-index", type=str, default=None)
+
+    return parser.parse_args()
+
+
+def ollama_chat(
+    session: requests.Session,
+    args: Namespace,
+    messages: list[dict[str, str]],
+) -> tuple[str, float, int | None, int | None]:
+    request_json = {
+        "model": args.llm_model,
+        "messages": messages,
+        "stream": True,
+        "keep_alive": args.keep_alive,
+        "options": {"temperature": args.temperature, "num_ctx": args.num_ctx},
+    }
+
+    start = time.perf_counter()
+    ttft = None
+    answer = []
+    prompt_tokens = None
+
+    with session.post(
+        url=args.llm_api_url, json=request_json, stream=True, timeout=600
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            answer.append(chunk.get("message", {}).get("content", ""))
+            if chunk.get("done"):
+                prompt_tokens = chunk.get("prompt_eval_count")
+
+    return "".join(answer), ttft or 0.0, prompt_tokens, None
+
+
+def openai_chat(
+    session: requests.Session,
+    args: Namespace,
+    messages: list[dict[str, str]],
+) -> tuple[str, float, int | None, int | None]:
+    request_json = {
+        "model": args.llm_model,
+        "messages": messages,
+        "temperature": args.temperature,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+
+    start = time.perf_counter()
+    ttft = None
+    answer = []
+    prompt_tokens, cached_tokens = None, None
+
+    with session.post(
+        url=args.llm_api_url, json=request_json, stream=True, timeout=600
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith(b"data: ") or line == b"data: [DONE]":
+                continue
+            chunk = json.loads(line[len(b"data: ") :])
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            for choice in chunk.get("choices", []):
+                answer.append(choice.get("delta", {}).get("content") or "")
+            usage = chunk.get("usage")
+            if usage:
+                prompt_tokens = usage.get("prompt_tokens")
+                details = usage.get("prompt_tokens_details") or {}
+                cached_tokens = details.get("cached_tokens")
+
+    return "".join(answer), ttft or 0.0, prompt_tokens, cached_tokens
+
+
+def read_questions(args: Namespace) -> list[str]:
+    if args.query is not None:
+        return [args.query]
+    if args.questions_file is not None:
+        with open(args.questions_file) as f:
+            return [line.strip() for line in f if line.strip()]
+    return [line.strip() for line in sys.stdin if line.strip()]
+
+
+@dataclass
+class Retriever:
+    client: QdrantClient
+    session: requests.Session
+    collection_name: str
+    ollama_api_url: str
+    ollama_model: str
+    num_ctx: int
+    topk: int
+    route_intents: bool = False
+    doc_store: DocStore | None = None
+    title_index: TitleIndex | None = None
+    previous_recipes: list[tuple[int, str]] = field(default_factory=list)
+    calls: Counter = field(default_factory=Counter)
+
+    def retrieve(self, question: str) -> tuple[str, list[tuple[int, str]] | None]:
+        intent, recipe_ids = (
+            classify_intent(question, self.previous_recipes, self.title_index)
+            if self.route_intents
+            else ("search", [])
+        )
+
+        recipes = []
+        if intent == "follow_up":
+            recipes = self.previous_recipes
+        elif intent == "title_lookup":
+            self.calls["payload_lookup"] += 1
+            recipes = fetch_recipes(
+                client=self.client,
+                collection_name=self.collection_name,
+                recipe_ids=recipe_ids[: self.topk],
+                doc_store=self.doc_store,
+            )
+            if not recipes:
+                intent = "search"
+
+        if intent == "search":
+            self.calls["embed"] += 1
+            embeddings = embed_queries(
+                queries=[question],
+                api_url=self.ollama_api_url,
+                model=self.ollama_model,
+                num_ctx=self.num_ctx,
+                session=self.session,
+            )
+            if embeddings is None:
+                return intent, None
+
+            self.calls["ann"] += 1
+            recipes = [
+                (recipe_id, text)
+                for recipe_id, text, _ in search_recipes(
+                    client=self.client,
+                    collection_name=self.collection_name,
+                    query_vector=embeddings[0],
+                    topk=self.topk,
+                    doc_store=self.doc_store,
+                )
+            ]
+
+        self.calls[intent] += 1
+        if intent != "smalltalk":
+            self.previous_recipes = recipes
+        return intent, recipes
+
+
+def main() -> None:
+    args = parse_args()
+
+    session = requests.Session()
+    chat = ollama_chat if args.llm_backend == "ollama" else openai_chat
+    stats = PrefixCacheStats()
+    retriever = Retriever(
+        client=QdrantClient(url=args.qdrant_api_url),
+        session=session,
+        collection_name=args.qdrant_collection_name,
+        ollama_api_url=args.ollama_api_url,
+        ollama_model=args.ollama_model,
+        num_ctx=args.num_ctx,
+        topk=args.topk,
+        route_intents=args.route_intents,
+        doc_store=DocStore(args.doc_store) if args.doc_store is not None else None,
+        title_index=(
+            TitleIndex.load(args.title_index) if args.title_index is not None else None
+        ),
+    )
+
+    for question in read_questions(args):
+        _, recipes = retriever.retrieve(question)
+        if recipes is None:
+            print("Query encoding error.")
+            continue
+
+        messages = build_messages(question=question, recipes=recipes)
+        prefix_hit_ratio = stats.observe(render_messages(messages))
+
+        answer, ttft, prompt_tokens, cached_tokens = chat(session, args, messages)
+        stats.record(prefix_hit_ratio, ttft, prompt_tokens, cached_tokens)
+
+        print("-------------------------\n" + answer, end="\n\n\n")
+
+    summary = stats.summary()
+    calls = dict(retriever.calls)
+    print(f"{summary = }")
+    print(f"{calls = }")
+
+    if args.stats_file is not None:
+        with open(args.stats_file, "w") as f:
+            json.dump(
+                {"summary": summary, "calls": calls, "records": stats.records},
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
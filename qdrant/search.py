@@ -1,14 +1,29 @@
+import json
+import sys
 from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING
 
-import requests
-from qdrant_client import QdrantClient
+from utils.profiler import add_profiler_args, profile_run, stage
+
+if TYPE_CHECKING:
+    import requests
+    from qdrant_client import QdrantClient, models
+
+    from utils.doc_store import DocStore
+    from utils.ingredients import IngredientIndex
+    from utils.reduction import Rescorer
 
 
 def parse_args() -> Namespace:
     parser = ArgumentParser()
 
-    parser.add_argument("--query", type=str, required=True)
+    query_group = parser.add_mutually_exclusive_group(required=True)
+    query_group.add_argument("--query", type=str)
+    query_group.add_argument("--queries-file", type=str)
+    parser.add_argument("--output-file", type=str, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
     parser.add_argument("--qdrant-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument("--qdrant-path", type=str, default=None)
     parser.add_argument(
         "--qdrant-collection-name",
         type=str,
@@ -20,42 +35,450 @@ def parse_args() -> Namespace:
     parser.add_argument("--ollama-model", type=str, default="bge-m3:567m-fp16")
     parser.add_argument("--num-ctx", type=int, default=8192)
     parser.add_argument("--topk", type=int, default=5)
+    parser.add_argument("--include-ingredients", type=str, nargs="+", default=[])
+    parser.add_argument("--exclude-ingredients", type=str, nargs="+", default=[])
+    parser.add_argument("--ingredient-index", type=str, default=None)
+    parser.add_argument("--max-filter-ids", type=int, default=10000)
+    parser.add_argument("--doc-store", type=str, default=None)
+    parser.add_argument("--projection-file", type=str, default=None)
+    parser.add_argument("--full-mmap", type=str, default="data/embeddings.mmap")
+    parser.add_argument("--rescore-limit", type=int, default=100)
+    parser.add_argument("--using", type=str, nargs="+", default=None)
+    parser.add_argument("--prefetch-limit", type=int, default=50)
+    add_profiler_args(parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.using is not None and args.projection_file is not None:
+        parser.error("--using doesn't support --projection-file")
+    return args
 
 
-def main() -> None:
-    args = parse_args()
+def embed_queries(
+    queries: list[str],
+    api_url: str,
+    model: str,
+    num_ctx: int,
+    session: "requests.Session | None" = None,
+) -> list[list[float]] | None:
+    import requests
 
-    client = QdrantClient(url=args.qdrant_api_url)
     ollama_request_json = {
-        "model": args.ollama_model,
-        "input": args.query,
-        "options": {"num_ctx": args.num_ctx},
+        "model": model,
+        "input": queries,
+        "options": {"num_ctx": num_ctx},
+    }
+
+    post = session.post if session is not None else requests.post
+    with stage("embed_queries") as stats:
+        ollama_response = post(url=api_url, json=ollama_request_json, timeout=120)
+        stats.add(items=len(queries), bytes=sum(len(q.encode()) for q in queries))
+
+        if ollama_response.status_code != 200:
+            stats.add(errors=1)
+            return None
+        return ollama_response.json()["embeddings"]
+
+
+def ingredient_terms(
+    ingredients: list[str], index: "IngredientIndex | None" = None
+) -> list[list[str]]:
+    from utils.ingredients import ingredient_keys, phrase_key
+
+    terms = []
+    for ingredient in ingredients:
+        words = ingredient_keys(ingredient)
+        if not words:
+            continue
+        if index is not None:
+            terms.append(index.term_keys(words))
+        else:
+            terms.append([phrase_key(words)])
+    return terms
+
+
+def ingredient_filter(
+    include: list[str],
+    exclude: list[str],
+    index: "IngredientIndex | None" = None,
+    max_ids: int = 10000,
+) -> "models.Filter | None":
+    from qdrant_client import models
+
+    include_terms = ingredient_terms(include, index)
+    exclude_keys = [key for keys in ingredient_terms(exclude, index) for key in keys]
+    if not include_terms and not exclude_keys:
+        return None
+
+    must, must_not = [], []
+
+    include_ids = index.intersect(include_terms) if index is not None else None
+    if include_terms and include_ids is not None and include_ids.shape[0] <= max_ids:
+        must.append(
+            models.FieldCondition(
+                key="recipe_id",
+                match=models.MatchAny(any=[int(i) for i in include_ids]),
+            )
+        )
+    else:
+        must += [
+            models.FieldCondition(key="ingredients", match=models.MatchAny(any=keys))
+            for keys in include_terms
+        ]
+
+    exclude_ids = index.union(exclude_keys) if index is not None else None
+    if exclude_keys and exclude_ids is not None and exclude_ids.shape[0] <= max_ids:
+        must_not.append(
+            models.FieldCondition(
+                key="recipe_id",
+                match=models.MatchAny(any=[int(i) for i in exclude_ids]),
+            )
+        )
+    elif exclude_keys:
+        must_not.append(
+            models.FieldCondition(
+                key="ingredients", match=models.MatchAny(any=exclude_keys)
+            )
+        )
+
+    return models.Filter(must=must, must_not=must_not)
+
+
+def named_query(
+    query_vector: list[float],
+    using: list[str],
+    prefetch_limit: int,
+    query_filter: "models.Filter | None" = None,
+) -> dict:
+    from qdrant_client import models
+
+    from utils.named_vectors import MULTIVECTORS
+
+    def vector_for(name: str) -> list:
+        return [query_vector] if name in MULTIVECTORS else query_vector
+
+    if len(using) == 1:
+        return {"query": vector_for(using[0]), "using": using[0]}
+
+    return {
+        "prefetch": [
+            models.Prefetch(
+                query=vector_for(name),
+                using=name,
+                filter=query_filter,
+                limit=prefetch_limit,
+            )
+            for name in using
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+    }
+
+
+def query_kwargs(
+    query_vector: list[float],
+    topk: int,
+    query_filter: "models.Filter | None" = None,
+    rescorer: "Rescorer | None" = None,
+    using: list[str] | None = None,
+    prefetch_limit: int = 50,
+) -> dict:
+    if using:
+        query = named_query(query_vector, using, prefetch_limit, query_filter)
+    elif rescorer is not None:
+        query = {"query": rescorer.reduce(query_vector)}
+    else:
+        query = {"query": query_vector}
+
+    return {
+        **query,
+        "with_payload": True,
+        "limit": max(rescorer.limit, topk) if rescorer else topk,
     }
 
-    ollama_response = requests.post(
-        url=args.ollama_api_url, json=ollama_request_json, timeout=120
+
+def collapse_points(
+    points: list,
+) -> dict[int, tuple[int, str | None, float | None]]:
+    recipes = {}
+    for point in points:
+        recipe_id = point.payload.get("recipe_id", point.id)
+        cluster_id = point.payload.get("cluster_id", recipe_id)
+        recipes.setdefault(
+            cluster_id,
+            (recipe_id, point.payload.get("text"), getattr(point, "score", None)),
+        )
+    return recipes
+
+
+def fill_texts(
+    collapsed: list[dict[int, tuple[int, str | None, float | None]]],
+    doc_store: "DocStore | None" = None,
+) -> list[list[tuple[int, str, float | None]]]:
+    missing = [
+        recipe_id
+        for recipes in collapsed
+        for recipe_id, text, _ in recipes.values()
+        if text is None
+    ]
+    texts = {}
+    if missing and doc_store is not None:
+        with stage("fetch_documents") as stats:
+            texts = doc_store.get_many(missing)
+            stats.add(items=len(missing), bytes=sum(len(t) for t in texts.values()))
+
+    return [
+        [
+            (recipe_id, text if text is not None else texts.get(recipe_id, ""), score)
+            for recipe_id, text, score in recipes.values()
+        ]
+        for recipes in collapsed
+    ]
+
+
+def fetch_recipes(
+    client: "QdrantClient",
+    collection_name: str,
+    recipe_ids: list[int],
+    doc_store: "DocStore | None" = None,
+) -> list[tuple[int, str]]:
+    from qdrant_client import models
+
+    if doc_store is not None:
+        collapsed = {recipe_id: (recipe_id, None, None) for recipe_id in recipe_ids}
+    else:
+        points, offset, found = [], None, set()
+        with stage("fetch_recipes") as stats:
+            while True:
+                page, offset = client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=models.Filter(
+                        must=[
+                            models.FieldCondition(
+                                key="recipe_id", match=models.MatchAny(any=recipe_ids)
+                            )
+                        ]
+                    ),
+                    limit=64,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False,
+                )
+                points += page
+                found.update(p.payload.get("recipe_id", p.id) for p in page)
+                if offset is None or found >= set(recipe_ids):
+                    break
+            stats.add(items=len(points))
+        collapsed = collapse_points(points)
+
+    recipes = fill_texts([collapsed], doc_store)[0]
+    return [(recipe_id, text) for recipe_id, text, _ in recipes if text]
+
+
+def search_recipes(
+    client: "QdrantClient",
+    collection_name: str,
+    query_vector: list[float],
+    topk: int,
+    query_filter: "models.Filter | None" = None,
+    doc_store: "DocStore | None" = None,
+    rescorer: "Rescorer | None" = None,
+    using: list[str] | None = None,
+    prefetch_limit: int = 50,
+) -> list[tuple[int, str, float | None]]:
+    return search_recipes_batch(
+        client=client,
+        collection_name=collection_name,
+        query_vectors=[query_vector],
+        topk=topk,
+        query_filter=query_filter,
+        doc_store=doc_store,
+        rescorer=rescorer,
+        using=using,
+        prefetch_limit=prefetch_limit,
+    )[0]
+
+
+def search_recipes_batch(
+    client: "QdrantClient",
+    collection_name: str,
+    query_vectors: list[list[float]],
+    topk: int,
+    query_filter: "models.Filter | None" = None,
+    doc_store: "DocStore | None" = None,
+    rescorer: "Rescorer | None" = None,
+    using: list[str] | None = None,
+    prefetch_limit: int = 50,
+) -> list[list[tuple[int, str, float | None]]]:
+    from qdrant_client import models
+
+    queries = [
+        query_kwargs(query_vector, topk, query_filter, rescorer, using, prefetch_limit)
+        for query_vector in query_vectors
+    ]
+
+    with stage("query_points") as stats:
+        if len(queries) == 1:
+            responses = [
+                client.query_points(
+                    collection_name=collection_name,
+                    query_filter=query_filter,
+                    **queries[0],
+                )
+            ]
+        else:
+            responses = client.query_batch_points(
+                collection_name=collection_name,
+                requests=[
+                    models.QueryRequest(filter=query_filter, **query)
+                    for query in queries
+                ],
+            )
+        stats.add(items=len(queries))
+
+    points = [response.points for response in responses]
+    if rescorer is not None:
+        with stage("rescore") as stats:
+            points = [
+                rescorer.rescore(query_points, query_vector, topk)
+                for query_points, query_vector in zip(points, query_vectors)
+            ]
+            stats.add(items=sum(len(r.points) for r in responses))
+
+    return fill_texts([collapse_points(p) for p in points], doc_store)
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        search(args)
+
+
+def read_queries(filename: str) -> list[str]:
+    with open(filename) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def search(args: Namespace) -> None:
+    from qdrant_client import QdrantClient
+
+    client = (
+        QdrantClient(path=args.qdrant_path)
+        if args.qdrant_path is not None
+        else QdrantClient(url=args.qdrant_api_url)
     )
 
-    if ollama_response.status_code == 200:
-        qdrant_response = client.query_points(
+    index = None
+    if args.ingredient_index is not None:
+        from utils.ingredients import IngredientIndex
+
+        index = IngredientIndex.load(args.ingredient_index)
+
+    doc_store = None
+    if args.doc_store is not None:
+        from utils.doc_store import DocStore
+
+        doc_store = DocStore(args.doc_store)
+
+    rescorer = None
+    if args.projection_file is not None:
+        from utils.reduction import Rescorer
+
+        params = client.get_collection(args.qdrant_collection_name).config.params
+        if isinstance(params.vectors, dict):
+            raise ValueError(
+                f"{args.qdrant_collection_name} has named vectors, point ids aren't "
+                f"{args.full_mmap} rows, rescoring needs one point per chunk"
+            )
+        rescorer = Rescorer(args.projection_file, args.full_mmap, args.rescore_limit)
+
+    query_filter = ingredient_filter(
+        args.include_ingredients,
+        args.exclude_ingredients,
+        index,
+        args.max_filter_ids,
+    )
+
+    if args.queries_file is not None:
+        search_batch(args, client, query_filter, doc_store, rescorer)
+        return
+
+    embeddings = embed_queries(
+        queries=[args.query],
+        api_url=args.ollama_api_url,
+        model=args.ollama_model,
+        num_ctx=args.num_ctx,
+    )
+
+    if embeddings is not None:
+        recipes = search_recipes(
+            client=client,
             collection_name=args.qdrant_collection_name,
-            query=ollama_response.json()["embeddings"][0],
-            with_payload=True,
-            limit=args.topk,
+            query_vector=embeddings[0],
+            topk=args.topk,
+            query_filter=query_filter,
+            doc_store=doc_store,
+            rescorer=rescorer,
+            using=args.using,
+            prefetch_limit=args.prefetch_limit,
         )
 
-        recipes = []
-        for point in qdrant_response.points:
-            recipes.append(point.payload["recipe"])
-        recipes = list(set(recipes))
-
-        for recipe in recipes:
+        for _, recipe, _ in recipes:
             print("-------------------------\n" + recipe, end="\n\n\n")
     else:
         print("Query encoding error.")
 
 
+def search_batch(
+    args: Namespace,
+    client: "QdrantClient",
+    query_filter: "models.Filter | None",
+    doc_store: "DocStore | None",
+    rescorer: "Rescorer | None",
+) -> None:
+    import requests
+
+    queries = read_queries(args.queries_file)
+    session = requests.Session()
+    output = open(args.output_file, "w") if args.output_file else sys.stdout
+
+    for start in range(0, len(queries), args.batch_size):
+        batch = queries[start : start + args.batch_size]
+        embeddings = embed_queries(
+            queries=batch,
+            api_url=args.ollama_api_url,
+            model=args.ollama_model,
+            num_ctx=args.num_ctx,
+            session=session,
+        )
+        if embeddings is None:
+            results = [None] * len(batch)
+        else:
+            results = search_recipes_batch(
+                client=client,
+                collection_name=args.qdrant_collection_name,
+                query_vectors=embeddings,
+                topk=args.topk,
+                query_filter=query_filter,
+                doc_store=doc_store,
+                rescorer=rescorer,
+                using=args.using,
+                prefetch_limit=args.prefetch_limit,
+            )
+
+        for query, recipes in zip(batch, results):
+            record = {"query": query}
+            if recipes is None:
+                record["error"] = "Query encoding error."
+            else:
+                record["recipes"] = [
+                    {"id": int(recipe_id), "score": score, "text": text}
+                    for recipe_id, text, score in recipes
+                ]
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    if output is not sys.stdout:
+        output.close()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,202 @@
+import json
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+from qdrant_client import QdrantClient, models
+
+from utils.hashing import file_hash
+from utils.profiler import add_profiler_args, profile_run, stage
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "--action", type=str, choices=["create", "restore"], required=True
+    )
+    parser.add_argument("--client-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument(
+        "--collection-name",
+        type=str,
+        default="chefrag-ollama-bge-m3-567m-fp16",
+    )
+    parser.add_argument("--snapshot-folder", type=str, default="data/snapshots")
+    parser.add_argument("--manifest-file", type=str, default=None)
+    parser.add_argument("--chunks-mmap", type=str, nargs="+", default=None)
+    parser.add_argument("--server-snapshot-folder", type=str, default=None)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--timeout", type=float, default=600)
+    add_profiler_args(parser)
+
+    return parser.parse_args()
+
+
+def manifest_filename(snapshot_folder: str | Path, collection_name: str) -> Path:
+    return Path(snapshot_folder) / f"{collection_name}.manifest.json"
+
+
+def file_entry(filename: str | Path) -> dict:
+    stat = Path(filename).stat()
+    return {"hash": file_hash(filename), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def matches_entry(filename: str | Path, entry: dict, verify: bool = False) -> bool:
+    stat = Path(filename).stat()
+    if stat.st_size != entry["size"]:
+        return False
+    if not verify and stat.st_mtime == entry["mtime"]:
+        return True
+    return file_hash(filename) == entry["hash"]
+
+
+def wait_ready(client: QdrantClient, collection_name: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get_collection(collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection_name} is {info.status} after {timeout}s")
+        time.sleep(0.5)
+
+
+def create_snapshot(
+    client: QdrantClient,
+    api_url: str,
+    collection_name: str,
+    snapshot_folder: str | Path,
+    embedding_files: list[str],
+    timeout: float = 600,
+) -> Path:
+    snapshot_folder = Path(snapshot_folder)
+    snapshot_folder.mkdir(parents=True, exist_ok=True)
+    wait_ready(client, collection_name, timeout)
+
+    with stage("create_snapshot"):
+        snapshot = client.create_snapshot(collection_name=collection_name, wait=True)
+
+    snapshot_file = snapshot_folder / snapshot.name
+    with stage("download_snapshot") as stats:
+        with requests.get(
+            url=f"{api_url}/collections/{collection_name}/snapshots/{snapshot.name}",
+            stream=True,
+            timeout=timeout,
+        ) as response:
+            response.raise_for_status()
+            with open(snapshot_file, "wb") as f:
+                for block in response.iter_content(chunk_size=1 << 20):
+                    f.write(block)
+        stats.add(items=1, bytes=snapshot_file.stat().st_size)
+
+    client.delete_snapshot(collection_name=collection_name, snapshot_name=snapshot.name)
+
+    info = client.get_collection(collection_name)
+    manifest = {
+        "collection_name": collection_name,
+        "snapshot_file": snapshot.name,
+        "snapshot": file_entry(snapshot_file),
+        "embeddings": {str(f): file_entry(f) for f in embedding_files},
+        "points_count": info.points_count,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    manifest_file = manifest_filename(snapshot_folder, collection_name)
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return manifest_file
+
+
+def restore_snapshot(
+    client: QdrantClient,
+    api_url: str,
+    collection_name: str,
+    manifest_file: str | Path,
+    embedding_files: list[str] | None = None,
+    server_snapshot_folder: str | None = None,
+    force: bool = False,
+    verify: bool = False,
+    timeout: float = 600,
+) -> None:
+    manifest_file = Path(manifest_file)
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+
+    snapshot_file = manifest_file.parent / manifest["snapshot_file"]
+    if embedding_files is None:
+        embedding_files = list(manifest["embeddings"])
+    if not force:
+        if not matches_entry(snapshot_file, manifest["snapshot"], verify):
+            raise ValueError(f"{snapshot_file} doesn't match manifest")
+        for filename in embedding_files:
+            entry = manifest["embeddings"].get(str(filename))
+            if entry is None:
+                raise ValueError(
+                    f"{filename} is not in {manifest_file}, snapshot was created "
+                    f"with {', '.join(manifest['embeddings'])}"
+                )
+            if Path(filename).is_file() and not matches_entry(filename, entry, verify):
+                raise ValueError(
+                    f"{filename} changed since snapshot, re-upload or use --force"
+                )
+
+    with stage("restore_snapshot") as stats:
+        if server_snapshot_folder is not None:
+            location = f"file://{server_snapshot_folder}/{manifest['snapshot_file']}"
+            client.recover_snapshot(
+                collection_name=collection_name,
+                location=location,
+                priority=models.SnapshotPriority.SNAPSHOT,
+                wait=True,
+            )
+        else:
+            with open(snapshot_file, "rb") as f:
+                response = requests.post(
+                    url=f"{api_url}/collections/{collection_name}/snapshots/upload",
+                    params={"priority": "snapshot", "wait": "true"},
+                    files={"snapshot": (manifest["snapshot_file"], f)},
+                    timeout=timeout,
+                )
+            response.raise_for_status()
+        stats.add(items=1, bytes=snapshot_file.stat().st_size)
+
+    wait_ready(client, collection_name, timeout)
+
+
+def main() -> None:
+    args = parse_args()
+
+    with profile_run(args):
+        client = QdrantClient(url=args.client_api_url, timeout=int(args.timeout))
+
+        if args.action == "create":
+            manifest_file = create_snapshot(
+                client=client,
+                api_url=args.client_api_url,
+                collection_name=args.collection_name,
+                snapshot_folder=args.snapshot_folder,
+                embedding_files=args.chunks_mmap or ["data/embeddings.mmap"],
+                timeout=args.timeout,
+            )
+            print(f"Snapshot manifest: {manifest_file}")
+        else:
+            restore_snapshot(
+                client=client,
+                api_url=args.client_api_url,
+                collection_name=args.collection_name,
+                manifest_file=args.manifest_file
+                or manifest_filename(args.snapshot_folder, args.collection_name),
+                embedding_files=args.chunks_mmap,
+                server_snapshot_folder=args.server_snapshot_folder,
+                force=args.force,
+                verify=args.verify,
+                timeout=args.timeout,
+            )
+            print(f"Collection {args.collection_name} restored")
+
+
+if __name__ == "__main__":
+    main()
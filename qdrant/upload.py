@@ -2,15 +2,27 @@ from argparse import ArgumentParser, Namespace
 
 import numpy as np
 import pandas as pd
-import requests
 from qdrant_client import QdrantClient, models
 from tqdm.auto import tqdm
 
+from qdrant.snapshot import create_snapshot
+from utils.delta import (
+    chunk_ids,
+    read_changeset,
+    read_chunk_delta,
+    read_dropped_ids,
+    removed_recipe_ids,
+)
+from utils.doc_store import DocStore
+from utils.named_vectors import MULTIVECTORS, read_named_chunks, recipe_vectors
+from utils.profiler import add_profiler_args, profile_run, stage
+
 
 def parse_args() -> Namespace:
     parser = ArgumentParser()
 
     parser.add_argument("--client-api-url", type=str, default="http://localhost:6333")
+    parser.add_argument("--client-path", type=str, default=None)
     parser.add_argument(
         "--collection-name",
         type=str,
@@ -20,51 +32,244 @@ def parse_args() -> Namespace:
     parser.add_argument("--chunks-file", type=str, default="data/chunks.parquet")
     parser.add_argument("--chunks-mmap", type=str, default="data/embeddings.mmap")
     parser.add_argument("--store-on-disk", action="store_true")
+    parser.add_argument("--delta-file", type=str, default=None)
+    parser.add_argument("--changeset-file", type=str, default=None)
+    parser.add_argument("--ingredients-file", type=str, default=None)
+    parser.add_argument("--slim-payload", action="store_true")
+    parser.add_argument("--doc-store", type=str, default="data/recipes.sqlite")
+    parser.add_argument("--named-chunks", type=str, nargs="+", default=None)
+    parser.add_argument("--snapshot-folder", type=str, default=None)
+    parser.add_argument("--snapshot-timeout", type=float, default=600)
+    add_profiler_args(parser)
+
+    args = parser.parse_args()
+    if args.named_chunks is not None and args.delta_file is not None:
+        parser.error("--named-chunks doesn't support --delta-file")
+    return args
+
+
+def chunk_payload(
+    row: pd.Series,
+    recipe_id_column: str,
+    ingredient_keys: dict[int, list[str]],
+    slim: bool = False,
+) -> dict:
+    recipe_id = int(row[recipe_id_column])
+    payload = {"recipe_id": recipe_id}
+
+    if slim:
+        payload["chunk_type"] = row.get("chunk_type", "full_recipe")
+    else:
+        payload["text"] = row["full_recipe"]
+    if "cluster_id" in row.index:
+        payload["cluster_id"] = int(row["cluster_id"])
+    if ingredient_keys:
+        payload["ingredients"] = ingredient_keys.get(recipe_id, [])
+
+    return payload
 
-    return parser.parse_args()
+
+def write_doc_store(
+    filename: str,
+    chunk_df: pd.DataFrame,
+    recipe_id_column: str,
+    removed_ids: set[int] | None = None,
+) -> None:
+    with stage("write_doc_store") as stats:
+        recipes_df = chunk_df.drop_duplicates(recipe_id_column)
+        doc_store = DocStore(filename)
+        if removed_ids:
+            doc_store.delete(removed_ids)
+        doc_store.write(zip(recipes_df[recipe_id_column], recipes_df["full_recipe"]))
+        doc_store.close()
+        stats.add(
+            items=recipes_df.shape[0],
+            bytes=int(recipes_df["full_recipe"].str.len().sum()),
+        )
+
+
+def changeset_removed_ids(args: Namespace) -> set[int] | None:
+    if args.changeset_file is None:
+        return None
+    return removed_recipe_ids(read_changeset(args.changeset_file))
 
 
 def main() -> None:
     args = parse_args()
-    client = QdrantClient(url=args.client_api_url)
 
-    collection_exist_response = requests.get(
-        url=f"{args.client_api_url}/collections/{args.collection_name}/exists"
+    with profile_run(args):
+        upload(args)
+
+        if args.snapshot_folder is not None:
+            embedding_files = (
+                [spec.split(":", maxsplit=1)[1] for spec in args.named_chunks]
+                if args.named_chunks is not None
+                else [args.chunks_mmap]
+            )
+            manifest_file = create_snapshot(
+                client=QdrantClient(
+                    url=args.client_api_url, timeout=int(args.snapshot_timeout)
+                ),
+                api_url=args.client_api_url,
+                collection_name=args.collection_name,
+                snapshot_folder=args.snapshot_folder,
+                embedding_files=embedding_files,
+                timeout=args.snapshot_timeout,
+            )
+            print(f"Snapshot manifest: {manifest_file}")
+
+
+def upload(args: Namespace) -> None:
+    client = (
+        QdrantClient(path=args.client_path)
+        if args.client_path is not None
+        else QdrantClient(url=args.client_api_url)
     )
-    collection_exist = collection_exist_response.json()["result"]["exists"]
+    collection_exist = client.collection_exists(args.collection_name)
 
-    if not collection_exist:
-        client.create_collection(
-            collection_name=args.collection_name,
-            vectors_config=models.VectorParams(
+    if args.named_chunks is not None:
+        named_df, mmaps = read_named_chunks(args.named_chunks, args.embedding_dim)
+        vectors_config = {
+            name: models.VectorParams(
                 size=args.embedding_dim,
                 distance=models.Distance.COSINE,
                 on_disk=args.store_on_disk,
-            ),
+                multivector_config=(
+                    models.MultiVectorConfig(
+                        comparator=models.MultiVectorComparator.MAX_SIM
+                    )
+                    if name in MULTIVECTORS
+                    else None
+                ),
+            )
+            for name in named_df["vector_name"].unique()
+        }
+    else:
+        vectors_config = models.VectorParams(
+            size=args.embedding_dim,
+            distance=models.Distance.COSINE,
+            on_disk=args.store_on_disk,
+        )
+
+    if not collection_exist:
+        client.create_collection(
+            collection_name=args.collection_name, vectors_config=vectors_config
         )
 
+    ingredient_keys = {}
+    if args.ingredients_file is not None:
+        ingredients_df = pd.read_parquet(
+            args.ingredients_file, columns=["recipe_id", "ingredient_keys"]
+        )
+        ingredient_keys = {
+            int(recipe_id): list(keys)
+            for recipe_id, keys in zip(
+                ingredients_df["recipe_id"], ingredients_df["ingredient_keys"]
+            )
+        }
+        with stage("create_payload_index"):
+            client.create_payload_index(
+                collection_name=args.collection_name,
+                field_name="ingredients",
+                field_schema=models.PayloadSchemaType.KEYWORD,
+            )
+            client.create_payload_index(
+                collection_name=args.collection_name,
+                field_name="recipe_id",
+                field_schema=models.PayloadSchemaType.INTEGER,
+            )
+
+    if args.named_chunks is not None:
+        upload_named(args, client, named_df, mmaps, ingredient_keys)
+        return
+
     chunk_df = pd.read_parquet(args.chunks_file)
+    ids = chunk_ids(chunk_df)
     chunk_mmap = np.memmap(
         filename=args.chunks_mmap,
         dtype=np.float32,
-        shape=(chunk_df.shape[0], args.embedding_dim),
+        shape=(int(ids.max(initial=-1)) + 1, args.embedding_dim),
         mode="r",
     )
 
-    client.upload_points(
-        collection_name=args.collection_name,
-        points=[
-            models.PointStruct(
-                id=idx,
-                vector=chunk_mmap[idx].tolist(),
-                payload={"text": row[1]["full_recipe"]},
-            )
-            for idx, row in enumerate(
-                tqdm(chunk_df.iterrows(), total=chunk_df.shape[0])
-            )
-        ],
+    if args.delta_file is not None:
+        added, removed = read_chunk_delta(args.delta_file)
+        if removed:
+            with stage("delete_points") as stats:
+                client.delete(
+                    collection_name=args.collection_name,
+                    points_selector=models.PointIdsList(points=sorted(removed)),
+                )
+                stats.add(items=len(removed))
+        chunk_df = chunk_df[np.isin(ids, list(added))]
+        ids = chunk_ids(chunk_df)
+
+    dropped = read_dropped_ids(args.chunks_mmap)
+    if dropped:
+        keep = ~np.isin(ids, list(dropped))
+        print(f"Skipping {(~keep).sum()} chunks dropped while vectorizing")
+        chunk_df, ids = chunk_df[keep], ids[keep]
+
+    recipe_id_column = "recipe_id" if "recipe_id" in chunk_df.columns else "id"
+
+    if args.slim_payload:
+        write_doc_store(
+            args.doc_store, chunk_df, recipe_id_column, changeset_removed_ids(args)
+        )
+
+    with stage("upload_points") as stats:
+        client.upload_points(
+            collection_name=args.collection_name,
+            points=[
+                models.PointStruct(
+                    id=int(idx),
+                    vector=chunk_mmap[idx].tolist(),
+                    payload=chunk_payload(
+                        row[1], recipe_id_column, ingredient_keys, args.slim_payload
+                    ),
+                )
+                for idx, row in zip(
+                    ids, tqdm(chunk_df.iterrows(), total=chunk_df.shape[0])
+                )
+            ],
+        )
+        stats.add(
+            items=chunk_df.shape[0], bytes=chunk_df.shape[0] * args.embedding_dim * 4
+        )
+
+
+def upload_named(
+    args: Namespace,
+    client: QdrantClient,
+    named_df: pd.DataFrame,
+    mmaps: list[np.memmap],
+    ingredient_keys: dict[int, list[str]],
+) -> None:
+    if args.slim_payload:
+        write_doc_store(
+            args.doc_store, named_df, "recipe_id", changeset_removed_ids(args)
+        )
+
+    n_recipes = named_df["recipe_id"].nunique()
+    points = (
+        models.PointStruct(
+            id=int(row["recipe_id"]),
+            vector=vectors,
+            payload={
+                k: v
+                for k, v in chunk_payload(
+                    row, "recipe_id", ingredient_keys, args.slim_payload
+                ).items()
+                if k != "chunk_type"
+            },
+        )
+        for row, vectors in tqdm(recipe_vectors(named_df, mmaps), total=n_recipes)
     )
 
+    with stage("upload_points") as stats:
+        client.upload_points(collection_name=args.collection_name, points=points)
+        stats.add(items=n_recipes, bytes=named_df.shape[0] * args.embedding_dim * 4)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,86 @@
+import math
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AdaptiveBatcher:
+    batch_size: int = 64
+    min_size: int = 1
+    max_size: int = 1024
+    max_bytes: int = 1 << 20
+    tolerance: float = 0.05
+    growth: float = 1.25
+    smoothing: float = 0.3
+    reprobe_after: int = 20
+    best_size: int = 0
+    ceiling: int = 0
+    stable: int = 0
+    successes: int = 0
+    failures: int = 0
+    latencies: dict[int, float] = field(default_factory=dict)
+    sizes: dict[int, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.batch_size = min(max(self.batch_size, self.min_size), self.max_size)
+        self.ceiling = self.ceiling or self.max_size
+
+    def take(self, sizes: list[int], start: int) -> int:
+        count, total = 0, 0
+        for size in sizes[start : start + self.batch_size]:
+            if count and total + size > self.max_bytes:
+                break
+            count += 1
+            total += size
+        return count
+
+    def best_latency(self) -> float:
+        return min(self.latencies.values(), default=float("inf"))
+
+    def success(self, items: int, elapsed: float, size_bytes: int) -> None:
+        self.successes += 1
+
+        key = round(math.log(items, self.growth))
+        previous = self.latencies.get(key)
+        latency = elapsed / max(size_bytes, 1)
+        if previous is not None:
+            latency = previous + self.smoothing * (latency - previous)
+        self.latencies[key] = latency
+        self.sizes[key] = items
+        self.best_size = self.sizes[min(self.latencies, key=self.latencies.get)]
+
+        self.stable += 1
+        if self.stable >= self.reprobe_after:
+            self.ceiling = min(self.ceiling + max(1, self.ceiling // 4), self.max_size)
+            self.batch_size = max(int(self.best_size / self.growth), self.min_size)
+            self.stable = 0
+            return
+
+        if latency <= self.best_latency() * (1 + self.tolerance):
+            self.batch_size = min(
+                max(self.batch_size, items + max(1, int(items * (self.growth - 1)))),
+                self.ceiling,
+            )
+        else:
+            if items > self.best_size:
+                self.ceiling = max(items - 1, self.min_size)
+            self.batch_size = max(self.best_size, self.min_size)
+            self.stable = 0
+
+    def failure(self, items: int) -> None:
+        self.failures += 1
+        self.ceiling = max(items - 1, self.min_size)
+        self.batch_size = max(self.min_size, min(self.batch_size, items) // 2)
+        self.best_size, self.stable = 0, 0
+        self.latencies.clear()
+        self.sizes.clear()
+
+    def operating_point(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "best_size": self.best_size,
+            "ceiling": self.ceiling,
+            "bytes_per_s": 1 / self.best_latency(),
+            "max_bytes": self.max_bytes,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,160 @@
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.hashing import text_hash
+
+RECIPE_COLUMNS = ["image_link", "title", "description", "ingredients", "recipe"]
+
+
+def recipe_hashes(df: pd.DataFrame) -> pd.Series:
+    return pd.Series(
+        [
+            text_hash(*(str(v) for v in values))
+            for values in df[RECIPE_COLUMNS].itertuples(index=False)
+        ],
+        index=df.index,
+    )
+
+
+def read_recipe_state(filename: str) -> pd.DataFrame:
+    if Path(filename).is_file():
+        return pd.read_parquet(filename)
+    return pd.DataFrame(
+        {
+            "link": pd.Series(dtype=str),
+            "recipe_id": pd.Series(dtype=np.int64),
+            "hash": pd.Series(dtype=str),
+        }
+    )
+
+
+def compute_changeset(
+    links: pd.Series, hashes: pd.Series, state_df: pd.DataFrame
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    current_df = pd.DataFrame({"link": links.values, "hash": hashes.values})
+    merged_df = current_df.merge(
+        state_df, on="link", how="outer", suffixes=("", "_old"), indicator=True
+    )
+
+    status = np.select(
+        [
+            merged_df["_merge"] == "left_only",
+            merged_df["_merge"] == "right_only",
+            merged_df["hash"] != merged_df["hash_old"],
+        ],
+        ["added", "removed", "changed"],
+        default="unchanged",
+    )
+    merged_df["status"] = status
+
+    next_id = int(state_df["recipe_id"].max()) + 1 if state_df.shape[0] else 0
+    added = merged_df["status"] == "added"
+    merged_df.loc[added, "recipe_id"] = np.arange(next_id, next_id + added.sum())
+    merged_df["recipe_id"] = merged_df["recipe_id"].astype(np.int64)
+
+    changeset_df = merged_df.loc[
+        merged_df["status"] != "unchanged", ["link", "recipe_id", "status", "hash"]
+    ].reset_index(drop=True)
+
+    new_state_df = merged_df.loc[
+        merged_df["status"] != "removed", ["link", "recipe_id", "hash"]
+    ].reset_index(drop=True)
+
+    return changeset_df, new_state_df
+
+
+def read_changeset(filename: str) -> pd.DataFrame:
+    return pd.read_parquet(filename)
+
+
+def affected_recipe_ids(changeset_df: pd.DataFrame) -> set[int]:
+    return set(changeset_df["recipe_id"].astype(int))
+
+
+def removed_recipe_ids(changeset_df: pd.DataFrame) -> set[int]:
+    removed = changeset_df["status"] == "removed"
+    return set(changeset_df.loc[removed, "recipe_id"].astype(int))
+
+
+def updated_links(changeset_df: pd.DataFrame) -> set[str]:
+    return set(changeset_df.loc[changeset_df["status"] != "removed", "link"])
+
+
+def chunk_ids(chunk_df: pd.DataFrame) -> np.ndarray:
+    for column in ("chunk_id", "id"):
+        if column in chunk_df.columns:
+            return chunk_df[column].to_numpy(dtype=np.int64)
+    return np.arange(chunk_df.shape[0], dtype=np.int64)
+
+
+def allocate_chunk_ids(used_ids: np.ndarray, count: int) -> np.ndarray:
+    end = int(used_ids.max(initial=-1)) + 1
+    free = np.setdiff1d(np.arange(end, dtype=np.int64), used_ids)[:count]
+    return np.concatenate(
+        [free, np.arange(end, end + count - free.shape[0], dtype=np.int64)]
+    )
+
+
+def chunk_delta_filename(chunks_file: str | Path) -> Path:
+    chunks_file = Path(chunks_file)
+    return chunks_file.with_name(f"{chunks_file.stem}_delta.json")
+
+
+def write_chunk_delta(
+    chunks_file: str | Path, added: np.ndarray, removed: np.ndarray
+) -> None:
+    save_chunk_delta(chunk_delta_filename(chunks_file), added, removed)
+
+
+def save_chunk_delta(
+    filename: str | Path, added: Iterable[int], removed: Iterable[int]
+) -> None:
+    with open(filename, "w") as f:
+        json.dump(
+            {
+                "added_chunk_ids": [int(i) for i in added],
+                "removed_chunk_ids": [int(i) for i in removed],
+            },
+            f,
+        )
+
+
+def read_chunk_delta(filename: str | Path) -> tuple[set[int], set[int]]:
+    with open(filename) as f:
+        delta = json.load(f)
+    return set(delta["added_chunk_ids"]), set(delta["removed_chunk_ids"])
+
+
+def dropped_filename(mmap_file: str | Path) -> Path:
+    mmap_file = Path(mmap_file)
+    return mmap_file.with_name(f"{mmap_file.stem}_dropped.json")
+
+
+def read_dropped_ids(mmap_file: str | Path) -> set[int]:
+    filename = dropped_filename(mmap_file)
+    if not filename.is_file():
+        return set()
+    with open(filename) as f:
+        return set(json.load(f)["dropped_chunk_ids"])
+
+
+def write_dropped_ids(mmap_file: str | Path, dropped: set[int]) -> None:
+    filename = dropped_filename(mmap_file)
+    if not dropped:
+        filename.unlink(missing_ok=True)
+        return
+    with open(filename, "w") as f:
+        json.dump({"dropped_chunk_ids": sorted(int(i) for i in dropped)}, f)
+
+
+def open_growing_mmap(filename: str | Path, rows: int, dim: int) -> np.memmap:
+    size = rows * dim * np.dtype(np.float32).itemsize
+    path = Path(filename)
+    if not path.is_file() or path.stat().st_size < size:
+        with open(path, "ab") as f:
+            f.truncate(size)
+    return np.memmap(filename=path, dtype=np.float32, shape=(rows, dim), mode="r+")
@@ -0,0 +1,46 @@
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+
+class DocStore:
+    def __init__(self, filename: str | Path, max_variables: int = 900) -> None:
+        self.filename = Path(filename)
+        self.max_variables = max_variables
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS recipes "
+            "(recipe_id INTEGER PRIMARY KEY, text TEXT NOT NULL)"
+        )
+
+    def write(self, items: Iterable[tuple[int, str]]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO recipes (recipe_id, text) VALUES (?, ?)",
+                ((int(recipe_id), text) for recipe_id, text in items),
+            )
+
+    def delete(self, recipe_ids: Iterable[int]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM recipes WHERE recipe_id = ?",
+                ((int(recipe_id),) for recipe_id in recipe_ids),
+            )
+
+    def get_many(self, recipe_ids: Iterable[int]) -> dict[int, str]:
+        recipe_ids = list(dict.fromkeys(int(i) for i in recipe_ids))
+        texts = {}
+        for start in range(0, len(recipe_ids), self.max_variables):
+            batch = recipe_ids[start : start + self.max_variables]
+            placeholders = ",".join("?" * len(batch))
+            texts.update(
+                self.connection.execute(
+                    f"SELECT recipe_id, text FROM recipes "
+                    f"WHERE recipe_id IN ({placeholders})",
+                    batch,
+                )
+            )
+        return texts
+
+    def close(self) -> None:
+        self.connection.close()
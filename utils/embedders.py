@@ -0,0 +1,108 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+
+import numpy as np
+import requests
+
+DEFAULT_MODELS = {
+    "vllm": "BAAI/bge-multilingual-gemma2",
+    "ollama": "bge-m3:567m-fp16",
+    "sentence-transformers": "BAAI/bge-m3",
+    "stub": "stub",
+}
+
+
+class Embedder(ABC):
+    dim: int
+
+    @abstractmethod
+    def encode(self, texts: list[str]) -> np.ndarray: ...
+
+
+class VLLMEmbedder(Embedder):
+    def __init__(self, model: str) -> None:
+        from vllm import LLM
+
+        self.llm = LLM(model=model, task="embed")
+        self.dim = self.llm.llm_engine.model_config.get_hidden_size()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        outputs = self.llm.encode(texts, use_tqdm=False)
+        return np.array([o.outputs.embedding for o in outputs], dtype=np.float32)
+
+
+class OllamaEmbedder(Embedder):
+    def __init__(
+        self,
+        model: str,
+        api_url: str = "http://localhost:11434/api/embed",
+        num_ctx: int = 8192,
+        timeout: int = 120,
+    ) -> None:
+        self.model = model
+        self.api_url = api_url
+        self.num_ctx = num_ctx
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.dim = self.encode(["dim"]).shape[1]
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        response = self.session.post(
+            url=self.api_url,
+            json={
+                "model": self.model,
+                "input": texts,
+                "options": {"num_ctx": self.num_ctx},
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return np.array(response.json()["embeddings"], dtype=np.float32)
+
+
+class SentenceTransformersEmbedder(Embedder):
+    def __init__(self, model: str, device: str = "cpu", batch_size: int = 32) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device=device)
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+
+class StubEmbedder(Embedder):
+    def __init__(self, dim: int = 1024) -> None:
+        self.dim = dim
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        embs = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for text_idx, text in enumerate(texts):
+            for token in re.findall(r"\w+", str(text).lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                embs[text_idx, bucket] += sign
+
+        norms = np.linalg.norm(embs, axis=1, keepdims=True)
+        return embs / np.maximum(norms, 1e-12)
+
+
+def get_embedder(backend: str, model: str, **kwargs) -> Embedder:
+    if backend == "vllm":
+        return VLLMEmbedder(model=model)
+    if backend == "ollama":
+        return OllamaEmbedder(model=model, **kwargs)
+    if backend == "sentence-transformers":
+        return SentenceTransformersEmbedder(model=model, **kwargs)
+    if backend == "stub":
+        return StubEmbedder(**kwargs)
+    raise ValueError(f"Unknown embedder backend: {backend}")
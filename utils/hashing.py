@@ -0,0 +1,48 @@
+import hashlib
+from pathlib import Path
+
+
+def file_hash(filename: str | Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(*parts: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FileHashCache:
+    def __init__(self, entries: dict[str, dict] | None = None) -> None:
+        self.entries = entries if entries is not None else {}
+        self.hashed = 0
+
+    def hash(self, filename: str | Path) -> str | None:
+        path = Path(filename)
+        if not path.is_file():
+            return None
+
+        stat = path.stat()
+        key = str(path)
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry["hash"]
+
+        digest = file_hash(path)
+        self.hashed += 1
+        self.entries[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+        }
+        return digest
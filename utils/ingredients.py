@@ -0,0 +1,137 @@
+import re
+
+import numpy as np
+
+ENDINGS = sorted(
+    [
+        "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ая",
+        "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей", "ом", "ем", "ах",
+        "ях", "ов", "ев", "ам", "ям", "ию", "ья", "ье", "ь", "а", "я", "о", "е",
+        "ы", "и", "у", "ю", "й",
+    ],
+    key=len,
+    reverse=True,
+)  # fmt: skip
+
+STOP_WORDS = {
+    "по", "вкусу", "для", "или", "и", "с", "без", "из", "на", "в", "свежий",
+    "свежая", "свежие", "свежего", "шт", "г", "гр", "кг", "мл", "л", "ст",
+    "ч", "стакан", "стакана", "ложка", "ложки", "щепотка", "пучок",
+}  # fmt: skip
+
+QUANTITY_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?(?:\s*-\s*\d+(?:[.,]\d+)?)?)\s*(.*)$")
+
+
+def stem(word: str) -> str:
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def parse_ingredient(text: str) -> tuple[str, str | None, str | None]:
+    text = re.sub(r"\([^)]*\)", " ", text.lower())
+    parts = re.split(r"\s+-\s+", text, maxsplit=1)
+
+    match = re.search(r"\d", text)
+    if len(parts) == 2:
+        name, amount = parts
+    elif match:
+        name, amount = text[: match.start()], text[match.start() :]
+    else:
+        name, amount = text, ""
+
+    quantity, unit = None, None
+    match = QUANTITY_PATTERN.match(amount.strip())
+    if match:
+        quantity, unit = match.group(1).replace(",", "."), match.group(2) or None
+    elif amount.strip():
+        unit = amount.strip()
+
+    name = " ".join(re.findall(r"[^\W\d_]+", name))
+    return name, quantity, unit
+
+
+def ingredient_keys(name: str) -> list[str]:
+    keys = []
+    for word in re.findall(r"[^\W\d_]+", name.lower()):
+        if word in STOP_WORDS or len(word) < 3:
+            continue
+        key = stem(word)
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def phrase_key(words: list[str]) -> str:
+    return " ".join(sorted(words))
+
+
+def name_keys(name: str) -> list[str]:
+    words = ingredient_keys(name)
+    return words + [phrase_key(words)] if len(words) > 1 else words
+
+
+class IngredientIndex:
+    def __init__(
+        self, keys: np.ndarray, offsets: np.ndarray, recipe_ids: np.ndarray
+    ) -> None:
+        self.keys = keys
+        self.offsets = offsets
+        self.recipe_ids = recipe_ids
+        self.key_positions = {key: idx for idx, key in enumerate(keys.tolist())}
+        self.phrases = [(key, set(key.split())) for key in keys.tolist() if " " in key]
+
+    @classmethod
+    def build(cls, recipe_keys: dict[int, list[str]]) -> "IngredientIndex":
+        postings: dict[str, list[int]] = {}
+        for recipe_id, keys in recipe_keys.items():
+            for key in set(keys):
+                postings.setdefault(key, []).append(recipe_id)
+
+        keys = np.array(sorted(postings), dtype=str)
+        lists = [np.unique(np.array(postings[k], dtype=np.int64)) for k in keys]
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids in lists])
+        recipe_ids = np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+        return cls(keys, offsets, recipe_ids)
+
+    def save(self, filename: str) -> None:
+        np.savez_compressed(
+            filename, keys=self.keys, offsets=self.offsets, recipe_ids=self.recipe_ids
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> "IngredientIndex":
+        data = np.load(filename)
+        return cls(data["keys"], data["offsets"], data["recipe_ids"])
+
+    def postings(self, key: str) -> np.ndarray:
+        idx = self.key_positions.get(key)
+        if idx is None:
+            return np.empty(0, dtype=np.int64)
+        return self.recipe_ids[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def phrases_with(self, words: list[str]) -> list[str]:
+        words = set(words)
+        return [key for key, key_words in self.phrases if words <= key_words]
+
+    def term_keys(self, words: list[str]) -> list[str]:
+        return words if len(words) == 1 else self.phrases_with(words)
+
+    def intersect(self, groups: list[list[str]]) -> np.ndarray:
+        if not groups:
+            return np.empty(0, dtype=np.int64)
+        recipe_ids = self.union(groups[0])
+        for keys in groups[1:]:
+            recipe_ids = np.intersect1d(
+                recipe_ids, self.union(keys), assume_unique=True
+            )
+        return recipe_ids
+
+    def union(self, keys: list[str]) -> np.ndarray:
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        if len(keys) == 1:
+            return self.postings(keys[0])
+        return np.unique(np.concatenate([self.postings(key) for key in keys]))
@@ -0,0 +1,128 @@
+import hashlib
+import re
+
+import numpy as np
+
+from utils.ingredients import stem
+
+SMALLTALK_WORDS = {
+    "привет", "приветик", "здравствуй", "здравствуйте", "добрый", "доброе",
+    "день", "утро", "вечер", "хай", "спасибо", "благодарю", "пожалуйста",
+    "пока", "до", "свидания", "встречи", "ок", "окей", "хорошо", "отлично",
+    "понятно", "ясно", "супер", "класс", "круто", "ага", "да", "нет", "как",
+    "дела", "ты", "кто", "тебя", "зовут", "большое", "огромное", "понял",
+    "поняла", "спс", "ладно",
+}  # fmt: skip
+
+FOLLOW_UP_REFERENT = re.compile(
+    r"\b(?:эт(?:от|ого|ом|ому|и|их)|т(?:от|ого|ом)|"
+    r"(?:перв|втор|трет|последн)\w*)\s+(?:рецепт|вариант|блюд)\w*"
+)
+
+FOLLOW_UP_PREFIXES = [
+    "а если", "а можно", "а чем", "а сколько", "а его", "а ее", "а их", "его",
+    "ее", "их", "подробнее", "поподробнее", "повтори", "еще раз", "чем заменить",
+]  # fmt: skip
+
+GENERIC_WORDS = {
+    "если", "можно", "сколько", "чем", "заменить", "вместо", "подробнее",
+    "поподробнее", "повтори", "приготовить", "готовить", "сделать", "рецепт",
+    "рецепта", "нужно", "надо", "минут", "долго", "лучше", "какой", "какая",
+    "какие", "этот", "этого", "этом",
+}  # fmt: skip
+
+TITLE_PREFIXES = [
+    "покажи рецепт", "дай рецепт", "найди рецепт", "рецепт", "как приготовить",
+    "как готовить", "как сделать", "приготовь", "хочу",
+]  # fmt: skip
+
+INTENTS = ["smalltalk", "follow_up", "title_lookup", "search"]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(re.findall(r"[^\W_]+", text.lower().replace("ё", "е")))
+
+
+def title_hash(title: str) -> int:
+    digest = hashlib.blake2b(normalize_text(title).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def strip_title_request(text: str) -> str:
+    text = normalize_text(text)
+    for prefix in TITLE_PREFIXES:
+        if text.startswith(prefix + " "):
+            return text[len(prefix) + 1 :]
+    return text
+
+
+class TitleIndex:
+    def __init__(self, hashes: np.ndarray, recipe_ids: np.ndarray) -> None:
+        self.hashes = hashes
+        self.recipe_ids = recipe_ids
+
+    @classmethod
+    def build(cls, titles: list[str], recipe_ids: list[int]) -> "TitleIndex":
+        hashes = np.array([title_hash(t) for t in titles], dtype=np.int64)
+        recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        order = np.lexsort((recipe_ids, hashes))
+        return cls(hashes[order], recipe_ids[order])
+
+    def save(self, filename: str) -> None:
+        np.savez_compressed(filename, hashes=self.hashes, recipe_ids=self.recipe_ids)
+
+    @classmethod
+    def load(cls, filename: str) -> "TitleIndex":
+        data = np.load(filename)
+        return cls(data["hashes"], data["recipe_ids"])
+
+    def lookup(self, title: str) -> np.ndarray:
+        key = title_hash(title)
+        start = np.searchsorted(self.hashes, key, side="left")
+        end = np.searchsorted(self.hashes, key, side="right")
+        return self.recipe_ids[start:end]
+
+
+def content_stems(text: str) -> set[str]:
+    return {
+        stem(word)
+        for word in normalize_text(text).split()
+        if len(word) > 3 and word not in GENERIC_WORDS
+    }
+
+
+def is_follow_up(text: str, previous_recipes: list[tuple[int, str]]) -> bool:
+    if FOLLOW_UP_REFERENT.search(text):
+        return True
+    if not any(text == p or text.startswith(p + " ") for p in FOLLOW_UP_PREFIXES):
+        return False
+
+    stems = content_stems(text)
+    if not stems:
+        return True
+    recipe_stems = set()
+    for _, recipe in previous_recipes:
+        recipe_stems |= content_stems(recipe)
+    return bool(stems & recipe_stems)
+
+
+def classify_intent(
+    question: str,
+    previous_recipes: list[tuple[int, str]],
+    title_index: TitleIndex | None = None,
+) -> tuple[str, list[int]]:
+    text = normalize_text(question)
+    words = text.split()
+
+    if not words or all(word in SMALLTALK_WORDS for word in words):
+        return "smalltalk", []
+
+    if title_index is not None:
+        recipe_ids = title_index.lookup(strip_title_request(text))
+        if recipe_ids.shape[0] > 0:
+            return "title_lookup", recipe_ids.tolist()
+
+    if previous_recipes and is_follow_up(text, previous_recipes):
+        return "follow_up", []
+
+    return "search", []
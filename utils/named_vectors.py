@@ -0,0 +1,85 @@
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+from utils.delta import chunk_ids, read_dropped_ids
+
+VECTOR_NAMES = {
+    "title": "title",
+    "description": "description",
+    "ingredients": "ingredients",
+    "recipe": "recipe",
+    "recipe_part": "steps",
+    "full_recipe": "full_recipe",
+}
+MULTIVECTORS = {"steps"}
+
+
+def read_named_chunks(
+    specs: list[str], dim: int
+) -> tuple[pd.DataFrame, list[np.memmap]]:
+    frames, mmaps = [], []
+    for source, spec in enumerate(specs):
+        chunks_file, mmap_file = spec.split(":", maxsplit=1)
+        chunk_df = pd.read_parquet(chunks_file)
+        ids = chunk_ids(chunk_df)
+        mmap_rows = int(ids.max(initial=-1)) + 1
+        dropped = read_dropped_ids(mmap_file)
+        if dropped:
+            keep = ~np.isin(ids, list(dropped))
+            chunk_df, ids = chunk_df[keep], ids[keep]
+
+        chunk_type = (
+            chunk_df["chunk_type"]
+            if "chunk_type" in chunk_df.columns
+            else pd.Series("full_recipe", index=chunk_df.index)
+        )
+        frames.append(
+            pd.DataFrame(
+                {
+                    "recipe_id": chunk_df["recipe_id"].to_numpy(dtype=np.int64),
+                    "vector_name": chunk_type.map(VECTOR_NAMES).to_numpy(),
+                    "source": source,
+                    "row": ids,
+                    "full_recipe": chunk_df["full_recipe"].to_numpy(),
+                    **(
+                        {"cluster_id": chunk_df["cluster_id"].to_numpy()}
+                        if "cluster_id" in chunk_df.columns
+                        else {}
+                    ),
+                }
+            )
+        )
+        mmaps.append(
+            np.memmap(
+                filename=mmap_file,
+                dtype=np.float32,
+                shape=(mmap_rows, dim),
+                mode="r",
+            )
+        )
+
+    named_df = pd.concat(frames, ignore_index=True)
+    named_df = named_df[named_df["vector_name"].notna()]
+    if "cluster_id" in named_df.columns:
+        named_df["cluster_id"] = (
+            named_df["cluster_id"].fillna(named_df["recipe_id"]).astype(np.int64)
+        )
+    return named_df.sort_values(["recipe_id", "source", "row"], kind="stable"), mmaps
+
+
+def recipe_vectors(
+    named_df: pd.DataFrame, mmaps: list[np.memmap]
+) -> Iterator[tuple[pd.Series, dict[str, list]]]:
+    for _, recipe_df in named_df.groupby("recipe_id", sort=False):
+        vectors = {}
+        for name, source, row in zip(
+            recipe_df["vector_name"], recipe_df["source"], recipe_df["row"]
+        ):
+            vector = mmaps[source][row].tolist()
+            if name in MULTIVECTORS:
+                vectors.setdefault(name, []).append(vector)
+            else:
+                vectors.setdefault(name, vector)
+        yield recipe_df.iloc[0], vectors
@@ -0,0 +1,138 @@
+import cProfile
+import json
+import resource
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_s: float = 0.0
+    items: int = 0
+    bytes: int = 0
+    retries: int = 0
+    errors: int = 0
+    peak_rss_mb: float = 0.0
+
+    def add(
+        self, items: int = 0, bytes: int = 0, retries: int = 0, errors: int = 0
+    ) -> None:
+        self.items += items
+        self.bytes += bytes
+        self.retries += retries
+        self.errors += errors
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+class StageProfiler:
+    def __init__(self) -> None:
+        self.stages: dict[str, StageStats] = {}
+        self.enabled = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = self.stages.setdefault(name, StageStats())
+        start = time.perf_counter()
+        try:
+            yield stats
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.calls += 1
+            stats.wall_s += time.perf_counter() - start
+            if self.enabled:
+                stats.peak_rss_mb = max(stats.peak_rss_mb, peak_rss_mb())
+
+    def records(self) -> list[dict[str, float]]:
+        records = []
+        for name, stats in self.stages.items():
+            record = {"stage": name, **asdict(stats)}
+            record["items_per_s"] = stats.items / stats.wall_s if stats.wall_s else 0.0
+            record["bytes_per_s"] = stats.bytes / stats.wall_s if stats.wall_s else 0.0
+            records.append(record)
+        return records
+
+    def to_jsonl(self) -> str:
+        now = time.time()
+        return "".join(
+            json.dumps({"time": now, "script": sys.argv[0], **record}) + "\n"
+            for record in self.records()
+        )
+
+    def to_prometheus(self) -> str:
+        records = self.records()
+        keys = [key for key in records[0] if key != "stage"] if records else []
+        lines = []
+        for key in keys:
+            lines.append(f"# TYPE chefrag_stage_{key} gauge")
+            for record in records:
+                lines.append(
+                    f'chefrag_stage_{key}{{stage="{record["stage"]}"}} {record[key]}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, filename: str, metrics_format: str = "jsonl") -> None:
+        if metrics_format == "prometheus":
+            with open(filename, "w") as f:
+                f.write(self.to_prometheus())
+        else:
+            with open(filename, "a") as f:
+                f.write(self.to_jsonl())
+
+
+PROFILER = StageProfiler()
+
+
+stage = PROFILER.stage
+
+
+def add_profiler_args(parser: ArgumentParser) -> None:
+    parser.add_argument("--metrics-file", type=str, default=None)
+    parser.add_argument(
+        "--metrics-format",
+        type=str,
+        choices=["jsonl", "prometheus"],
+        default="jsonl",
+    )
+    parser.add_argument(
+        "--profile", type=str, choices=["cprofile", "pyinstrument"], default=None
+    )
+    parser.add_argument("--profile-file", type=str, default="profile.out")
+
+
+@contextmanager
+def profile_run(args: Namespace) -> Iterator[StageProfiler]:
+    PROFILER.enabled = args.metrics_file is not None
+
+    if args.profile == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profile == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+
+    try:
+        yield PROFILER
+    finally:
+        if args.profile == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(args.profile_file)
+        elif args.profile == "pyinstrument":
+            profiler.stop()
+            with open(args.profile_file, "w") as f:
+                f.write(profiler.output_html())
+
+        if args.metrics_file is not None:
+            PROFILER.dump(args.metrics_file, args.metrics_format)
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+
+SYSTEM_PROMPT = (
+    "ты кулинарный ассистент. отвечай на вопрос пользователя, используя рецепты "
+    "из контекста. если в контексте нет подходящего рецепта, скажи об этом и "
+    "ответь на основе общих знаний. не выдумывай ингредиенты и шаги, которых нет "
+    "в рецепте."
+)
+
+
+def build_messages(
+    question: str,
+    recipes: list[tuple[int, str]],
+    system_prompt: str = SYSTEM_PROMPT,
+) -> list[dict[str, str]]:
+    context = "\n\n".join(
+        f"рецепт {recipe_id}:\n{text}" for recipe_id, text in sorted(recipes)
+    )
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"рецепты:\n{context}\n\nвопрос: {question}"},
+    ]
+
+
+def render_messages(messages: list[dict[str, str]]) -> str:
+    return "".join(f"<{m['role']}>\n{m['content']}\n" for m in messages)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    size = min(len(a), len(b))
+    idx = 0
+    while idx < size and a[idx] == b[idx]:
+        idx += 1
+    return idx
+
+
+@dataclass
+class PrefixCacheStats:
+    history_size: int = 32
+    prompts: list[str] = field(default_factory=list)
+    records: list[dict[str, float]] = field(default_factory=list)
+
+    def observe(self, prompt: str) -> float:
+        reused = max(
+            (common_prefix_length(prompt, prev) for prev in self.prompts), default=0
+        )
+        self.prompts = (self.prompts + [prompt])[-self.history_size :]
+        return reused / max(len(prompt), 1)
+
+    def record(
+        self,
+        prefix_hit_ratio: float,
+        ttft_s: float,
+        prompt_tokens: int | None = None,
+        cached_tokens: int | None = None,
+    ) -> None:
+        self.records.append(
+            {
+                "prefix_hit_ratio": prefix_hit_ratio,
+                "ttft_s": ttft_s,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+            }
+        )
+
+    def summary(self) -> dict[str, float]:
+        if not self.records:
+            return {"requests": 0}
+
+        total = len(self.records)
+        summary = {
+            "requests": total,
+            "mean_prefix_hit_ratio": sum(r["prefix_hit_ratio"] for r in self.records)
+            / total,
+            "first_ttft_s": self.records[0]["ttft_s"],
+            "mean_ttft_s": sum(r["ttft_s"] for r in self.records) / total,
+        }
+
+        evaluated = [r for r in self.records if r["prompt_tokens"] is not None]
+        if evaluated:
+            summary["mean_prompt_tokens"] = sum(
+                r["prompt_tokens"] for r in evaluated
+            ) / len(evaluated)
+
+        cached = [r for r in evaluated if r["cached_tokens"] is not None]
+        if cached:
+            summary["server_cached_token_ratio"] = sum(
+                r["cached_tokens"] for r in cached
+            ) / max(sum(r["prompt_tokens"] for r in cached), 1)
+
+        return summary
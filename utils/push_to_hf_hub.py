@@ -1,12 +1,32 @@
 import os
+import tempfile
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator
 
-import pandas as pd
-from datasets import Dataset, Features, Sequence, Value
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datasets import Features, Sequence, Value
 from dotenv import load_dotenv
+from huggingface_hub import HfApi
+
+from utils.recipe_store import csv_batches
 
 load_dotenv()
 
+RECIPE_FEATURES = Features(
+    {
+        "link": Value("string"),
+        "image_link": Value("string"),
+        "title": Value("string"),
+        "description": Value("string"),
+        "ingredients": Sequence(Value("string")),
+        "recipe": Sequence(Value("string")),
+    }
+)
+
 
 def parse_args() -> Namespace:
     parser = ArgumentParser()
@@ -14,32 +34,199 @@ def parse_args() -> Namespace:
     parser.add_argument(
         "--recipes-filename", type=str, default="data/recipes_texts.csv"
     )
+    parser.add_argument("--chunks-file", type=str, default=None)
+    parser.add_argument("--chunks-mmap", type=str, default=None)
+    parser.add_argument("--embedding-dim", type=int, default=1024)
     parser.add_argument("--dataset-name", type=str, default="epishchik/RuRecipes-93k")
+    parser.add_argument("--output-dir", type=str, default=None)
+    parser.add_argument("--shard-rows", type=int, default=20000)
+    parser.add_argument("--block-size", type=int, default=16 << 20)
+    parser.add_argument("--workers", type=int, default=4)
 
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
+class ShardWriter:
+    def __init__(
+        self,
+        folder: Path,
+        schema: pa.Schema,
+        shard_rows: int,
+        executor: ThreadPoolExecutor,
+        max_pending: int,
+    ) -> None:
+        self.folder = folder
+        self.schema = schema
+        self.shard_rows = shard_rows
+        self.executor = executor
+        self.max_pending = max_pending
+        self.batches: list[pa.RecordBatch] = []
+        self.rows = 0
+        self.shards: list[Path] = []
+        self.pending: list[Future] = []
+        folder.mkdir(parents=True, exist_ok=True)
 
-    recipes_df = pd.read_csv(args.recipes_filename)
+    def write(self, batch: pa.RecordBatch) -> None:
+        self.batches.append(batch)
+        self.rows += batch.num_rows
+        while self.rows >= self.shard_rows:
+            self.flush()
 
-    recipes_df["ingredients"] = recipes_df["ingredients"].apply(lambda x: eval(x))
-    recipes_df["recipe"] = recipes_df["recipe"].apply(lambda x: eval(x))
+    def flush(self) -> None:
+        if not self.rows:
+            return
 
-    features = Features(
-        {
-            "link": Value("string"),
-            "image_link": Value("string"),
-            "title": Value("string"),
-            "description": Value("string"),
-            "ingredients": Sequence(Value("string")),
-            "recipe": Sequence(Value("string")),
-        }
-    )
+        table = pa.Table.from_batches(self.batches, schema=self.schema)
+        shard, rest = table.slice(0, self.shard_rows), table.slice(self.shard_rows)
+        self.batches, self.rows = rest.to_batches(), rest.num_rows
+
+        if len(self.pending) >= self.max_pending:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+            self.pending = [f for f in self.pending if not f.done()]
+
+        filename = self.folder / f"train-{len(self.shards):05d}.parquet"
+        self.shards.append(filename)
+        self.pending.append(self.executor.submit(write_shard, shard, filename))
+
+    def close(self) -> int:
+        self.flush()
+        for future in self.pending:
+            future.result()
+
+        for idx, filename in enumerate(self.shards):
+            filename.rename(
+                filename.with_name(f"train-{idx:05d}-of-{len(self.shards):05d}.parquet")
+            )
+        return len(self.shards)
+
+
+def write_shard(table: pa.Table, filename: Path) -> None:
+    with pq.ParquetWriter(filename, table.schema, compression="zstd") as writer:
+        writer.write_table(table)
+
+
+def recipe_batches(
+    filename: str, schema: pa.Schema, block_size: int
+) -> Iterator[pa.RecordBatch]:
+    for batch in csv_batches(filename, block_size=block_size):
+        yield pa.RecordBatch.from_arrays(
+            [batch.column(field.name).cast(field.type) for field in schema],
+            schema=schema,
+        )
+
+
+def chunk_batches(filename: str, block_rows: int) -> Iterator[pa.RecordBatch]:
+    yield from pq.ParquetFile(filename).iter_batches(batch_size=block_rows)
+
+
+def embedding_batches(
+    filename: str, dim: int, schema: pa.Schema, block_rows: int
+) -> Iterator[pa.RecordBatch]:
+    embeddings = np.memmap(filename, dtype=np.float32, mode="r").reshape(-1, dim)
+    for start in range(0, embeddings.shape[0], block_rows):
+        block = np.ascontiguousarray(embeddings[start : start + block_rows])
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(np.arange(start, start + block.shape[0], dtype=np.int64)),
+                pa.FixedSizeListArray.from_arrays(pa.array(block.ravel()), dim),
+            ],
+            schema=schema,
+        )
+
+
+def export_config(
+    batches: Iterator[pa.RecordBatch],
+    folder: Path,
+    schema: pa.Schema,
+    shard_rows: int,
+    executor: ThreadPoolExecutor,
+    max_pending: int,
+) -> int:
+    writer = ShardWriter(folder, schema, shard_rows, executor, max_pending)
+    for batch in batches:
+        writer.write(batch)
+    return writer.close()
+
+
+def dataset_card(configs: list[str]) -> str:
+    lines = ["---", "configs:"]
+    for idx, config in enumerate(configs):
+        lines.append(f"- config_name: {config}")
+        lines.append(f"  data_files: {config}/*.parquet")
+        if idx == 0:
+            lines.append("  default: true")
+    lines.append("---")
+    return "\n".join(lines) + "\n"
+
+
+def export(args: Namespace, output_dir: Path) -> None:
+    configs = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        recipes_schema = RECIPE_FEATURES.arrow_schema
+        configs["recipes"] = export_config(
+            recipe_batches(args.recipes_filename, recipes_schema, args.block_size),
+            output_dir / "recipes",
+            recipes_schema,
+            args.shard_rows,
+            executor,
+            args.workers,
+        )
+
+        if args.chunks_file is not None:
+            chunks_schema = Features.from_arrow_schema(
+                pq.read_schema(args.chunks_file)
+            ).arrow_schema
+            configs["chunks"] = export_config(
+                chunk_batches(args.chunks_file, args.shard_rows),
+                output_dir / "chunks",
+                chunks_schema,
+                args.shard_rows,
+                executor,
+                args.workers,
+            )
+
+        if args.chunks_mmap is not None:
+            embeddings_schema = Features(
+                {
+                    "id": Value("int64"),
+                    "embedding": Sequence(Value("float32"), length=args.embedding_dim),
+                }
+            ).arrow_schema
+            configs["embeddings"] = export_config(
+                embedding_batches(
+                    args.chunks_mmap,
+                    args.embedding_dim,
+                    embeddings_schema,
+                    args.shard_rows,
+                ),
+                output_dir / "embeddings",
+                embeddings_schema,
+                args.shard_rows,
+                executor,
+                args.workers,
+            )
+
+    with open(output_dir / "README.md", "w") as f:
+        f.write(dataset_card(list(configs)))
+    print(f"{configs = }")
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.output_dir is not None:
+        export(args, Path(args.output_dir))
+        return
 
-    hf_dataset = Dataset.from_pandas(df=recipes_df, features=features)
-    hf_dataset.push_to_hub(repo_id=args.dataset_name, token=os.getenv("HF_TOKEN"))
+    with tempfile.TemporaryDirectory() as output_dir:
+        export(args, Path(output_dir))
+        HfApi(token=os.getenv("HF_TOKEN")).upload_folder(
+            repo_id=args.dataset_name,
+            folder_path=output_dir,
+            repo_type="dataset",
+        )
 
 
 if __name__ == "__main__":
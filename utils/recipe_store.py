@@ -0,0 +1,123 @@
+import ast
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+TEXT_COLUMNS = ["link", "image_link", "title", "description"]
+LIST_COLUMNS = ["ingredients", "recipe"]
+
+
+def parse_list(value: str | None) -> list[str]:
+    if value is None:
+        return []
+    try:
+        return list(ast.literal_eval(value))
+    except (ValueError, SyntaxError):
+        return []
+
+
+def csv_batches(
+    filename: str | Path, separator: str = ",", block_size: int = 16 << 20
+) -> Iterator[pa.RecordBatch]:
+    column_names = pv.open_csv(
+        filename,
+        read_options=pv.ReadOptions(block_size=1 << 16),
+        parse_options=pv.ParseOptions(delimiter=separator, newlines_in_values=True),
+    ).schema.names
+
+    reader = pv.open_csv(
+        filename,
+        read_options=pv.ReadOptions(block_size=block_size),
+        parse_options=pv.ParseOptions(delimiter=separator, newlines_in_values=True),
+        convert_options=pv.ConvertOptions(
+            column_types={
+                name: pa.large_string()
+                for name in TEXT_COLUMNS + LIST_COLUMNS
+                if name in column_names
+            },
+            strings_can_be_null=True,
+        ),
+    )
+
+    for batch in reader:
+        columns, fields = [], []
+        for field in batch.schema:
+            column = batch.column(field.name)
+            if field.name in LIST_COLUMNS:
+                column = pa.array(
+                    [parse_list(v) for v in column.to_pylist()],
+                    type=pa.large_list(pa.large_string()),
+                )
+            columns.append(column)
+            fields.append(pa.field(field.name, column.type))
+        yield pa.RecordBatch.from_arrays(columns, schema=pa.schema(fields))
+
+
+def read_csv_store(
+    filename: str | Path, separator: str = ",", block_size: int = 16 << 20
+) -> pa.Table:
+    table = pa.Table.from_batches(list(csv_batches(filename, separator, block_size)))
+    if "recipe_id" not in table.column_names:
+        table = table.append_column(
+            "recipe_id", pa.array(np.arange(table.num_rows, dtype=np.int64))
+        )
+    return table
+
+
+def write_store(table: pa.Table, filename: str | Path) -> None:
+    with pa.OSFile(str(filename), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=16384)
+
+
+def open_store(filename: str | Path) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(str(filename), "r")).read_all()
+
+
+def remove_chars_pattern(chars_to_remove: list[str]) -> str:
+    return "[" + "".join(f"\\x{{{ord(c):x}}}" for c in "".join(chars_to_remove)) + "]"
+
+
+def clean_column(column: pa.ChunkedArray, pattern: str) -> pa.ChunkedArray:
+    if not pa.types.is_large_list(column.type):
+        return pc.replace_substring_regex(column, pattern=pattern, replacement="")
+
+    chunks = []
+    for chunk in column.chunks:
+        values = pc.replace_substring_regex(
+            chunk.values, pattern=pattern, replacement=""
+        )
+        chunks.append(pa.LargeListArray.from_arrays(chunk.offsets, values))
+    return pa.chunked_array(chunks, type=column.type)
+
+
+def clean_store(table: pa.Table, chars_to_remove: list[str]) -> pa.Table:
+    pattern = remove_chars_pattern(chars_to_remove)
+    for name in ["title", "description"] + LIST_COLUMNS:
+        if name in table.column_names:
+            idx = table.column_names.index(name)
+            table = table.set_column(
+                idx, name, clean_column(table.column(name), pattern)
+            )
+    return table
+
+
+def recipe_frames(
+    table: pa.Table, batch_rows: int, lists_as_text: bool
+) -> Iterator[pd.DataFrame]:
+    for batch in table.to_batches(max_chunksize=batch_rows):
+        frame = {}
+        for name in batch.schema.names:
+            column = batch.column(name)
+            if name in LIST_COLUMNS:
+                values = column.to_pylist()
+                frame[name] = [str(v) for v in values] if lists_as_text else values
+            else:
+                values = column.to_pandas()
+                frame[name] = values.where(values.notna(), np.nan)
+        yield pd.DataFrame(frame)
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import numpy as np
+
+
+def mmap_rows(filename: str | Path, dim: int) -> int:
+    return Path(filename).stat().st_size // (dim * np.dtype(np.float32).itemsize)
+
+
+def open_embeddings(filename: str | Path, dim: int) -> np.memmap:
+    return np.memmap(
+        filename=filename,
+        dtype=np.float32,
+        shape=(mmap_rows(filename, dim), dim),
+        mode="r",
+    )
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def fit_pca(
+    embeddings: np.ndarray, target_dim: int, block_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    dim = embeddings.shape[1]
+    total = np.zeros(dim, dtype=np.float64)
+    gram = np.zeros((dim, dim), dtype=np.float64)
+
+    for start in range(0, embeddings.shape[0], block_size):
+        block = np.asarray(embeddings[start : start + block_size], dtype=np.float64)
+        total += block.sum(axis=0)
+        gram += block.T @ block
+
+    n = embeddings.shape[0]
+    mean = total / n
+    covariance = gram / n - np.outer(mean, mean)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1][:target_dim]
+
+    return mean.astype(np.float32), eigenvectors[:, order].astype(np.float32)
+
+
+def truncation(dim: int, target_dim: int) -> tuple[np.ndarray, np.ndarray]:
+    return np.zeros(dim, dtype=np.float32), np.eye(dim, target_dim, dtype=np.float32)
+
+
+def save_projection(
+    filename: str | Path, mean: np.ndarray, components: np.ndarray
+) -> None:
+    np.savez(filename, mean=mean, components=components)
+
+
+def load_projection(filename: str | Path) -> tuple[np.ndarray, np.ndarray]:
+    data = np.load(filename)
+    return data["mean"], data["components"]
+
+
+def project(
+    vectors: np.ndarray, mean: np.ndarray, components: np.ndarray
+) -> np.ndarray:
+    return normalize((np.asarray(vectors, dtype=np.float32) - mean) @ components)
+
+
+class Rescorer:
+    def __init__(
+        self, projection_file: str | Path, full_mmap: str | Path, limit: int
+    ) -> None:
+        self.mean, self.components = load_projection(projection_file)
+        self.full = open_embeddings(full_mmap, self.components.shape[0])
+        self.limit = limit
+
+    def reduce(self, query_vector: list[float]) -> list[float]:
+        reduced = project(np.array([query_vector]), self.mean, self.components)
+        return reduced[0].tolist()
+
+    def rescore(self, points: list, query_vector: list[float], topk: int) -> list:
+        if not points:
+            return points
+        ids = np.array([point.id for point in points], dtype=np.int64)
+        order = np.argsort(ids)
+        vectors = normalize(np.asarray(self.full[ids[order]]))
+        scores = np.empty(len(ids), dtype=np.float32)
+        scores[order] = vectors @ normalize(np.array([query_vector]))[0]
+
+        ranked = np.argsort(-scores, kind="stable")[:topk]
+        for idx in ranked:
+            points[idx].score = float(scores[idx])
+        return [points[idx] for idx in ranked]